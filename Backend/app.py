@@ -2,17 +2,24 @@ from flask import Flask
 from routes.auth_routes import auth_routes
 from routes.main_routes import main_routes
 from routes.medicine_routes import medicine_bp
+from routes.job_routes import job_routes
 from flask_cors import CORS
 from database import init_app
+from utils.background_jobs import start_background_jobs
+from utils.password_hashing import start_pool
+
+start_pool()  # Fork the password hashing workers before any other thread starts
 
 app = Flask(__name__)
 CORS(app)
 
 init_app(app)
+start_background_jobs()
 
 app.register_blueprint(auth_routes, url_prefix='/auth')
 app.register_blueprint(main_routes,url_prefix='/api/v1')
 app.register_blueprint(medicine_bp,url_prefix="/api/v1")
+app.register_blueprint(job_routes,url_prefix="/api/v1")
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5001, debug=True)
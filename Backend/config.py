@@ -10,5 +10,136 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')  
     SERPAPI_KEY = ""
     API_KEY = "" #GEMINI API KEY
-    
 
+    # Local OpenFDA drug-label index (built with ingest_labels.py)
+    LABEL_STORE_PATH = os.environ.get('LABEL_STORE_PATH', os.path.join(BASE_DIR, 'data', 'drug_labels.sqlite3'))
+    OPENFDA_FALLBACK = os.environ.get('OPENFDA_FALLBACK', 'true').lower() == 'true'  # Query OpenFDA on an index miss
+    SUGGESTION_LIMIT = int(os.environ.get('SUGGESTION_LIMIT', 10))  # Default number of autocomplete results
+    SUGGESTION_MAX_LIMIT = int(os.environ.get('SUGGESTION_MAX_LIMIT', 50))
+
+    # Upstream response cache (OpenFDA, SerpAPI, IBM)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'mongo')  # 'memory' or 'mongo' (memory LRU in front of a shared collection)
+    CACHE_COLLECTION = os.environ.get('CACHE_COLLECTION', 'upstream_cache')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))  # Per upstream, in-process LRU size
+    CACHE_TTLS = {  # Seconds an entry is served as fresh
+        'openfda': int(os.environ.get('CACHE_TTL_OPENFDA', 24 * 3600)),
+        'serpapi': int(os.environ.get('CACHE_TTL_SERPAPI', 7 * 24 * 3600)),
+        'ibm': int(os.environ.get('CACHE_TTL_IBM', 3600)),
+        'ocr': int(os.environ.get('CACHE_TTL_OCR', 30 * 24 * 3600)),  # Keyed by image content, so rarely stale
+    }
+    CACHE_NEGATIVE_TTL = int(os.environ.get('CACHE_NEGATIVE_TTL', 600))  # Seconds to remember "not found"
+    CACHE_STALE_TTL = int(os.environ.get('CACHE_STALE_TTL', 24 * 3600))  # Serve expired entries this long while refreshing
+    CACHE_REFRESH_WORKERS = int(os.environ.get('CACHE_REFRESH_WORKERS', 4))
+
+    # Outbound HTTP (pooled keep-alive sessions, see utils/http_client.py)
+    UPSTREAM_WORKERS = int(os.environ.get('UPSTREAM_WORKERS', 16))  # Threads for concurrent upstream calls
+    UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 16))  # Keep-alive connections per upstream
+    UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3))
+    UPSTREAM_TIMEOUTS = {  # Read deadline in seconds per upstream
+        'openfda': float(os.environ.get('OPENFDA_TIMEOUT', 5)),
+        'serpapi': float(os.environ.get('SERPAPI_TIMEOUT', 5)),
+        'ibm': float(os.environ.get('IBM_TIMEOUT', 60)),
+    }
+    MEDICINE_IMAGE_GRACE = float(os.environ.get('MEDICINE_IMAGE_GRACE', 0.3))  # Seconds to wait for the image once label data is ready
+
+    # Drug image catalog (Mongo `drug_images`) and its background warmer
+    IMAGE_CATALOG_NEGATIVE_DAYS = int(os.environ.get('IMAGE_CATALOG_NEGATIVE_DAYS', 30))  # Retry names with no image after this
+    IMAGE_WARMER_ENABLED = os.environ.get('IMAGE_WARMER_ENABLED', 'true').lower() == 'true'
+    IMAGE_WARMER_HOURLY_BUDGET = int(os.environ.get('IMAGE_WARMER_HOURLY_BUDGET', 50))  # SerpAPI queries per hour
+    IMAGE_WARMER_CANDIDATES = int(os.environ.get('IMAGE_WARMER_CANDIDATES', 1000))  # Most-used names considered each run
+
+    # Medicine reminders (see utils/reminder_scheduler.py)
+    REMINDER_TIMEZONE = os.environ.get('REMINDER_TIMEZONE', 'UTC')  # Timezone the "HH:MM" medicine times are in
+    REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 500))  # Due reminders claimed per query
+    REMINDER_MAX_SLEEP = int(os.environ.get('REMINDER_MAX_SLEEP', 60))  # Longest the dispatcher sleeps before re-checking
+    REMINDER_MAX_LATENESS = int(os.environ.get('REMINDER_MAX_LATENESS', 15 * 60))  # Skip reminders missed by more than this
+    REMINDER_SHARDS = int(os.environ.get('REMINDER_SHARDS', 8))  # Dispatch is split by user-id hash into this many leases
+    REMINDER_MAX_SHARDS_PER_PROCESS = int(os.environ.get('REMINDER_MAX_SHARDS_PER_PROCESS', 0))  # Cap on top of the even split over live workers, 0 = none
+    FCM_SEND_WORKERS = int(os.environ.get('FCM_SEND_WORKERS', 4))  # Concurrent FCM batch requests
+
+    # Leader election for background jobs (Mongo `leases` collection)
+    LEASE_TTL = int(os.environ.get('LEASE_TTL', 180))  # Seconds before a silent holder's jobs fail over
+
+    # Expiry of current medicines (see Medicine.clean_expired_medicines)
+    MEDICINE_EXPIRY_INTERVAL = int(os.environ.get('MEDICINE_EXPIRY_INTERVAL', 300))  # Seconds between sweeps
+    MEDICINE_EXPIRY_BATCH_SIZE = int(os.environ.get('MEDICINE_EXPIRY_BATCH_SIZE', 500))  # Medicines deleted per write
+    MEDICINE_EXPIRY_BATCH_PAUSE = float(os.environ.get('MEDICINE_EXPIRY_BATCH_PAUSE', 0.1))  # Seconds between batches
+
+    # Per-user collections (medicines, reports, otps, access_requests, patient_links)
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))  # Default ?limit= for paginated lists
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+    STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 50))  # Patients loaded per query when streaming
+    USER_ARRAYS_MIGRATED = os.environ.get('USER_ARRAYS_MIGRATED', 'false').lower() == 'true'  # Skip the lazy per-user migration
+    MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 200))  # Users per batch in migrate_user_arrays.py
+    MIGRATION_BATCH_PAUSE = float(os.environ.get('MIGRATION_BATCH_PAUSE', 0.5))  # Seconds between batches
+
+    # Per-request count of bytes read from Mongo (X-Mongo-Bytes-Read header and /metrics)
+    MONGO_BYTES_METRICS = os.environ.get('MONGO_BYTES_METRICS', 'false').lower() == 'true'  # Re-encodes read replies, so off by default
+    MONGO_BYTES_SAMPLE_RATE = float(os.environ.get('MONGO_BYTES_SAMPLE_RATE', 0.1))  # Share of requests measured when on
+
+    # Doctor search (see User.find_by_role_and_name)
+    DOCTOR_SEARCH_LIMIT = int(os.environ.get('DOCTOR_SEARCH_LIMIT', 20))  # Results returned by default
+    DOCTOR_SEARCH_MAX_LIMIT = int(os.environ.get('DOCTOR_SEARCH_MAX_LIMIT', 100))
+    DOCTOR_SEARCH_CANDIDATES = int(os.environ.get('DOCTOR_SEARCH_CANDIDATES', 500))  # Users read before ranking
+
+    # Indexes (see models/indexes.py and manage_indexes.py)
+    INDEX_BOOTSTRAP = os.environ.get('INDEX_BOOTSTRAP', 'true').lower() == 'true'  # Create missing indexes at startup
+
+    # Password reset OTPs
+    OTP_TTL = int(os.environ.get('OTP_TTL', 600))  # Seconds an OTP stays valid
+
+    # Outbound mail (see utils/mail_queue.py)
+    SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+    SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'true').lower() == 'true'
+    SMTP_USER = os.environ.get('SMTP_USER', '')  # Empty to skip login (e.g. a local SMTP stand-in)
+    SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')  # An app password, not the account password
+    SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 10))
+    SMTP_IDLE_TIMEOUT = float(os.environ.get('SMTP_IDLE_TIMEOUT', 60))  # Seconds before an unused connection is closed
+    MAIL_SENDER = os.environ.get('MAIL_SENDER', SMTP_USER or 'no-reply@localhost')
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 20))  # Messages claimed per batch
+    MAIL_POLL_INTERVAL = float(os.environ.get('MAIL_POLL_INTERVAL', 2))  # Seconds between queue polls when idle
+    MAIL_CLAIM_TIMEOUT = int(os.environ.get('MAIL_CLAIM_TIMEOUT', 120))  # Seconds before a claimed message is retried
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 5))
+    MAIL_RETRY_BASE = float(os.environ.get('MAIL_RETRY_BASE', 30))  # Seconds before the first retry, doubled each time
+    MAIL_RETENTION_DAYS = int(os.environ.get('MAIL_RETENTION_DAYS', 7))  # Sent/failed messages kept this long
+
+    # Password hashing (see utils/password_hashing.py)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # Changing it re-hashes on next login
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64))  # Queued + running before 503
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # Seconds
+
+    # Authentication (see utils/auth.py)
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))  # Verified tokens remembered until they expire
+
+    # Prescription OCR (see utils/ocr_utils.py)
+    GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash')
+    OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', 2000))  # In-process LRU of OCR results
+    OCR_CACHE_SHARED_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_SHARED_MAX_ENTRIES', 20000))  # OCR results kept in the Mongo cache tier (LRU)
+    OCR_CACHE_MAX_VALUE_BYTES = int(os.environ.get('OCR_CACHE_MAX_VALUE_BYTES', 256 * 1024))  # Larger results stay in memory only
+    OCR_MAX_DIMENSION = int(os.environ.get('OCR_MAX_DIMENSION', 2048))  # Longest side, in pixels, sent to the model
+    OCR_JPEG_QUALITY = int(os.environ.get('OCR_JPEG_QUALITY', 85))
+    OCR_DRAFT_MIN_DIMENSION = int(os.environ.get('OCR_DRAFT_MIN_DIMENSION', 1600))  # JPEG draft decoding never goes below this longest side
+    OCR_PASSTHROUGH_MAX_BYTES = int(os.environ.get('OCR_PASSTHROUGH_MAX_BYTES', 1024 * 1024))  # Larger JPEGs are always re-encoded
+    OCR_GRAYSCALE = os.environ.get('OCR_GRAYSCALE', 'false').lower() == 'true'  # Documents rarely need colour
+    OCR_AUTOCONTRAST = os.environ.get('OCR_AUTOCONTRAST', 'false').lower() == 'true'  # Helps faint or badly lit scans
+    OCR_WORKERS = int(os.environ.get('OCR_WORKERS', 8))  # Concurrent page OCR calls, shared by all requests
+    REPORT_MAX_PAGES = int(os.environ.get('REPORT_MAX_PAGES', 20))  # Pages per /upload-reports/batch request
+
+    # Asynchronous OCR / summarization jobs (see utils/job_worker.py and routes/job_routes.py)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))  # Jobs run at once by each process
+    JOB_MAX_ACTIVE_PER_USER = int(os.environ.get('JOB_MAX_ACTIVE_PER_USER', 3))  # Queued + running jobs per user before 429
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))  # Seconds between queue polls when idle
+    JOB_CLAIM_TIMEOUT = int(os.environ.get('JOB_CLAIM_TIMEOUT', 120))  # Seconds without a heartbeat before a job is retried
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_QUEUE_TTL = int(os.environ.get('JOB_QUEUE_TTL', 3600))  # Seconds an unfinished job is kept
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))  # Seconds a finished job's result is kept
+    JOB_EVENTS_POLL_INTERVAL = float(os.environ.get('JOB_EVENTS_POLL_INTERVAL', 0.5))  # Seconds between job reads in an event stream
+    JOB_EVENTS_KEEPALIVE = float(os.environ.get('JOB_EVENTS_KEEPALIVE', 15))
+    JOB_EVENTS_TIMEOUT = float(os.environ.get('JOB_EVENTS_TIMEOUT', 300))  # Seconds before an event stream is closed
+
+    # /ask-ai answer cache (see utils/answer_index.py); answers live in the "ibm" upstream cache
+    ANSWER_NEAR_DUPLICATES = os.environ.get('ANSWER_NEAR_DUPLICATES', 'false').lower() == 'true'  # Reuse answers to near-identical questions
+    ANSWER_SIMILARITY_THRESHOLD = float(os.environ.get('ANSWER_SIMILARITY_THRESHOLD', 0.9))  # Jaccard similarity of the questions' content words
+    ANSWER_INDEX_MAX_ENTRIES = int(os.environ.get('ANSWER_INDEX_MAX_ENTRIES', 5000))  # Questions remembered for near-duplicate lookups
@@ -1,8 +1,10 @@
 from flask_pymongo import PyMongo
 from config import Config
+from utils.mongo_metrics import mongo_listeners, register_request_metrics
 
 mongo = PyMongo()
 
 def init_app(app):
     app.config.from_object(Config)
-    mongo.init_app(app)
+    mongo.init_app(app, event_listeners=mongo_listeners())
+    register_request_metrics(app)
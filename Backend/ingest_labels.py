@@ -0,0 +1,32 @@
+"""
+Load OpenFDA drug-label dumps into the local label index used by /medicine/<name>.
+
+Usage:
+    python ingest_labels.py drug-label-0001-of-0012.json.zip drug-label-0002-of-0012.json.zip ...
+
+Re-running with the weekly export only rewrites labels that changed.
+"""
+import argparse
+import time
+
+from config import Config
+from utils.label_store import LabelStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest OpenFDA drug-label dumps into the local index")
+    parser.add_argument("paths", nargs="+", help="OpenFDA drug-label export files (.json or .json.zip)")
+    parser.add_argument("--store", default=Config.LABEL_STORE_PATH, help="Path of the label index")
+    parser.add_argument("--force", action="store_true", help="Re-read files that were already ingested")
+    args = parser.parse_args()
+
+    started = time.time()
+    stats = LabelStore(args.store).ingest(args.paths, force=args.force)
+    print(
+        f"Ingested {stats['files']} file(s) ({stats['skipped_files']} unchanged): "
+        f"{stats['updated']} of {stats['labels']} labels written in {time.time() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Create and check the MongoDB indexes declared in models/indexes.py.
+
+Usage:
+    python manage_indexes.py apply    # create missing indexes (idempotent)
+    python manage_indexes.py report   # list missing, extra and unused indexes and collection scans
+
+`report` exits with status 1 when an index is missing or a model query scans a collection.
+"""
+import argparse
+import sys
+
+from flask import Flask
+
+from database import init_app
+from models.indexes import apply_indexes, index_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the MongoDB indexes used by the models")
+    parser.add_argument("command", choices=["apply", "report"])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    init_app(app)
+
+    if args.command == "apply":
+        failed = apply_indexes()
+        print("All indexes are in place" if not failed else f"Failed to create: {failed}")
+        sys.exit(1 if failed else 0)
+
+    report = index_report()
+    for section, entries in report.items():
+        print(f"{section}: {', '.join(entries) if entries else 'none'}")
+    sys.exit(1 if report["missing"] or report["collection_scans"] else 0)
+
+
+if __name__ == "__main__":
+    main()
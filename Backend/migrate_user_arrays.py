@@ -0,0 +1,40 @@
+"""
+Move the arrays embedded in user documents (saved/current medicines, reports, OTPs,
+access requests, authorized patients) into their own collections.
+
+Usage:
+    python migrate_user_arrays.py [--batch-size 200] [--pause 0.5]
+
+Safe to run while the app is serving traffic and safe to re-run: users touched by the
+app are migrated on first access, and every copied entry is keyed so it is never duplicated.
+Once it reports 0 users, set USER_ARRAYS_MIGRATED=true.
+"""
+import argparse
+import time
+
+from flask import Flask
+
+from config import Config
+from database import init_app
+from models.indexes import apply_indexes
+from models.user_migration import migrate_all
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move embedded user arrays into their own collections")
+    parser.add_argument("--batch-size", type=int, default=Config.MIGRATION_BATCH_SIZE, help="Users per batch")
+    parser.add_argument("--pause", type=float, default=Config.MIGRATION_BATCH_PAUSE, help="Seconds between batches")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    init_app(app)
+
+    with app.app_context():
+        apply_indexes()
+        started = time.time()
+        migrated = migrate_all(args.batch_size, args.pause)
+        print(f"Migrated {migrated} user(s) in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from database import mongo
+from datetime import datetime, timedelta, timezone
+from config import Config
+from utils.label_store import normalize_key
+
+
+class DrugImage:
+    """Catalog of drug image URLs keyed by normalized drug name (collection `drug_images`)."""
+
+    @classmethod
+    def collection(cls):
+        return mongo.db.drug_images
+
+    @classmethod
+    def get(cls, name):
+        """
+        Return the catalog entry for `name`, or None if it has to be (re)fetched.
+        Entries recording "no image found" are only trusted for IMAGE_CATALOG_NEGATIVE_DAYS.
+        """
+        entry = cls.collection().find_one({"_id": normalize_key(name)})
+        if not entry:
+            return None
+        if entry.get("image_url") is None:
+            fetched_at = entry["fetched_at"].replace(tzinfo=timezone.utc)
+            if fetched_at < datetime.now(timezone.utc) - timedelta(days=Config.IMAGE_CATALOG_NEGATIVE_DAYS):
+                return None
+        return entry
+
+    @classmethod
+    def save(cls, name, image_url, source="serpapi"):
+        cls.collection().update_one(
+            {"_id": normalize_key(name)},
+            {"$set": {
+                "name": name,
+                "image_url": image_url,
+                "source": source,
+                "fetched_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+
+    @classmethod
+    def known_keys(cls, names):
+        """Return the normalized names among `names` that already have a catalog entry."""
+        keys = [normalize_key(name) for name in names]
+        return {doc["_id"] for doc in cls.collection().find({"_id": {"$in": keys}}, {"_id": 1})}
@@ -0,0 +1,195 @@
+"""
+Every index the models rely on, in one place. `apply_indexes()` creates them idempotently
+(at startup, or with `python manage_indexes.py apply`) and `index_report()` checks them
+against the server: missing, extra and unused indexes, and whether the queries the models
+issue are served by an index.
+"""
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import Config
+from database import mongo
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING), ("name_tokens", ASCENDING)], name="role_name_tokens"),
+        IndexModel(
+            [("fcm_token", ASCENDING)], name="fcm_token",
+            partialFilterExpression={"fcm_token": {"$type": "string"}}
+        ),
+    ],
+    "medicines": [
+        IndexModel([("user_id", ASCENDING), ("list", ASCENDING), ("_id", ASCENDING)], name="user_list"),
+        IndexModel([("user_id", ASCENDING), ("name", ASCENDING)], name="user_name"),
+        IndexModel(
+            [("list", ASCENDING), ("expires_at", ASCENDING)], name="list_expires_at",
+            partialFilterExpression={"expires_at": {"$type": "date"}}
+        ),
+        IndexModel(
+            [("legacy_key", ASCENDING)], name="legacy_key", unique=True,
+            partialFilterExpression={"legacy_key": {"$exists": True}}
+        ),
+    ],
+    "reminders": [
+        IndexModel([("shard", ASCENDING), ("next_fire_at", ASCENDING)], name="shard_next_fire_at"),
+        IndexModel(
+            [("user_id", ASCENDING), ("medicine_name", ASCENDING), ("time", ASCENDING)],
+            name="user_medicine_time", unique=True
+        ),
+        IndexModel(
+            [("expires_at", ASCENDING)], name="expires_at",
+            partialFilterExpression={"expires_at": {"$type": "date"}}
+        ),
+    ],
+    "reports": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id"),
+        IndexModel(
+            [("legacy_key", ASCENDING)], name="legacy_key", unique=True,
+            partialFilterExpression={"legacy_key": {"$exists": True}}
+        ),
+    ],
+    "otps": [
+        IndexModel([("email", ASCENDING), ("otp_hash", ASCENDING)], name="email_otp_hash"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel(
+            [("legacy_key", ASCENDING)], name="legacy_key", unique=True,
+            partialFilterExpression={"legacy_key": {"$exists": True}}
+        ),
+    ],
+    "access_requests": [
+        IndexModel([("doctor_id", ASCENDING), ("patient_id", ASCENDING)], name="doctor_patient", unique=True),
+        IndexModel([("doctor_id", ASCENDING), ("_id", ASCENDING)], name="doctor_id"),
+    ],
+    "patient_links": [
+        IndexModel([("doctor_id", ASCENDING), ("patient_id", ASCENDING)], name="doctor_patient", unique=True),
+        IndexModel([("patient_id", ASCENDING)], name="patient_id"),
+    ],
+    "mail_queue": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0),
+    ],
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_available_at"),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)], name="user_status"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "lease_members": [
+        IndexModel([("group", ASCENDING), ("expires_at", ASCENDING)], name="group_expires_at"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "job_pages": [
+        IndexModel([("job_id", ASCENDING), ("number", ASCENDING)], name="job_number", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    Config.CACHE_COLLECTION: [
+        # Mongo drops cache entries once they are past their stale window
+        IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0),
+        # Count and LRU eviction of the bounded caches (MongoBackend max_entries)
+        IndexModel([("cache", ASCENDING), ("used_at", ASCENDING)], name="cache_used_at"),
+    ],
+}
+
+# Representative queries issued by the models: (collection, filter, sort). Each one should
+# be answered from an index; index_report() flags the ones planned as a collection scan.
+PROBE_ID = ObjectId("000000000000000000000000")
+PROBE_TIME = datetime(2000, 1, 1, tzinfo=timezone.utc)
+MODEL_QUERIES = {
+    "User.get_by_email": ("users", {"email": "probe@example.com"}, None),
+    "User.find_by_role_and_name": (
+        "users", {"role": "doctor", "name_tokens": {"$elemMatch": {"$gte": "probe", "$lt": "probe\uffff"}}}, None
+    ),
+    "Medicine.get_saved_medicines": ("medicines", {"user_id": PROBE_ID, "list": "saved"}, [("_id", ASCENDING)]),
+    "Medicine.clean_expired_medicines": ("medicines", {"list": "current", "expires_at": {"$type": "date", "$lte": PROBE_TIME}}, None),
+    "Reminder.claim_due": (
+        "reminders", {"shard": {"$in": [0]}, "next_fire_at": {"$lte": PROBE_TIME}}, [("next_fire_at", ASCENDING)]
+    ),
+    "Reminder.remove_expired": ("reminders", {"expires_at": {"$type": "date", "$lte": PROBE_TIME}}, None),
+    "User.get_reports": ("reports", {"user_id": PROBE_ID}, [("_id", ASCENDING)]),
+    "User.verify_otp": ("otps", {"email": "probe@example.com", "otp_hash": "0" * 64, "verified": False}, None),
+    "User.get_access_requests": ("access_requests", {"doctor_id": PROBE_ID}, [("_id", ASCENDING)]),
+    "MailSender.claim_batch": (
+        "mail_queue", {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": PROBE_TIME}},
+        [("next_attempt_at", ASCENDING)]
+    ),
+    "User.iter_patient_links": ("patient_links", {"doctor_id": PROBE_ID}, [("_id", ASCENDING)]),
+    "MongoBackend._evict": (Config.CACHE_COLLECTION, {"cache": "ocr"}, [("used_at", ASCENDING)]),
+    "ShardLeases.share": ("lease_members", {"group": "reminders", "expires_at": {"$gt": PROBE_TIME}}, None),
+    "Job.claim": (
+        "jobs", {"status": {"$in": ["queued", "running"]}, "available_at": {"$lte": PROBE_TIME}}, [("available_at", ASCENDING)]
+    ),
+    "Job.get_pages": ("job_pages", {"job_id": PROBE_ID}, [("number", ASCENDING)]),
+    "Job.active_count": ("jobs", {"user_id": PROBE_ID, "status": {"$in": ["queued", "running"]}}, None),
+    "Job.heartbeat": ("jobs", {"_id": PROBE_ID, "status": "running", "claim_id": PROBE_ID}, None),
+}
+
+
+def apply_indexes(db=None):
+    """
+    Create every registered index that does not exist yet. Safe to run repeatedly and from
+    several processes. An index that cannot be built (e.g. duplicate emails for the unique
+    email index) is reported and skipped so the others are still created.
+    Returns {collection: [index names]} for the indexes that failed.
+    """
+    db = db if db is not None else mongo.db
+    failed = {}
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                db[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                name = index.document["name"]
+                print(f"Could not create index {collection_name}.{name}: {e}")
+                failed.setdefault(collection_name, []).append(name)
+    return failed
+
+
+def _winning_stages(plan):
+    """Names of every stage in an explain() winning plan."""
+    stages = [plan.get("stage")]
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            stages += _winning_stages(child)
+    if "queryPlan" in plan:  # Slot-based engine wraps the classic plan
+        stages += _winning_stages(plan["queryPlan"])
+    return [stage for stage in stages if stage]
+
+
+def index_report(db=None):
+    """
+    Compare the registry with the server. Returns:
+    - missing: registered indexes the server does not have
+    - extra: server indexes that are not in the registry
+    - unused: registered indexes with no accesses since the server started ($indexStats)
+    - collection_scans: MODEL_QUERIES whose winning plan is a COLLSCAN
+    """
+    db = db if db is not None else mongo.db
+    report = {"missing": [], "extra": [], "unused": [], "collection_scans": []}
+
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = set(collection.index_information()) - {"_id_"}
+        registered = {index.document["name"] for index in indexes}
+        report["missing"] += [f"{collection_name}.{name}" for name in sorted(registered - existing)]
+        report["extra"] += [f"{collection_name}.{name}" for name in sorted(existing - registered)]
+
+        try:
+            stats = collection.aggregate([{"$indexStats": {}}])
+            for stat in stats:
+                if stat["name"] in registered and stat["accesses"]["ops"] == 0:
+                    report["unused"].append(f"{collection_name}.{stat['name']}")
+        except OperationFailure as e:
+            print(f"$indexStats unavailable for {collection_name}: {e}")
+
+    for query_name, (collection_name, query, sort) in MODEL_QUERIES.items():
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _winning_stages(plan):
+            report["collection_scans"].append(query_name)
+
+    return report
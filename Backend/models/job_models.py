@@ -0,0 +1,211 @@
+from database import mongo
+from datetime import datetime, timedelta, timezone
+from bson import Binary, ObjectId
+from config import Config
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+ACTIVE_STATUSES = ["queued", "running"]
+
+# Seconds between taking a job slot and inserting the job, at the very most
+SLOT_SETTLE_SECONDS = 60
+
+
+class JobLimitReached(Exception):
+    """The user already has JOB_MAX_ACTIVE_PER_USER jobs queued or running."""
+
+
+class Job:
+    """
+    One document per submitted OCR / summarization job in the `jobs` collection, with its
+    uploads in `job_pages` (one document per page, so a many-page report stays far from the
+    16 MB document limit).
+    `available_at` is when the job can next be claimed: a claim pushes it forward by
+    JOB_CLAIM_TIMEOUT (and progress updates keep pushing it), so a job whose worker died is
+    picked up again. Finished jobs keep their result until `expires_at` (TTL index).
+    `job_slots` holds each user's count of queued + running jobs ({_id: user_id, active}).
+    """
+
+    @classmethod
+    def collection(cls):
+        return mongo.db.jobs
+
+    @classmethod
+    def pages_collection(cls):
+        return mongo.db.job_pages
+
+    @classmethod
+    def create(cls, user_id, kind, pages, params=None):
+        """
+        Queue a job over `pages` ((jpeg_bytes, digest) pairs) and return its id.
+        Raises JobLimitReached when the user is at the concurrency limit.
+        """
+        user_id = ObjectId(user_id)
+        if not cls._take_slot(user_id):
+            raise JobLimitReached()
+
+        now = datetime.now(timezone.utc)
+        job_id = ObjectId()
+        expires_at = now + timedelta(seconds=Config.JOB_QUEUE_TTL)
+        try:
+            cls._insert(job_id, user_id, kind, pages, params, now, expires_at)
+        except Exception:
+            cls._free_slot(user_id)
+            cls.pages_collection().delete_many({"job_id": job_id})
+            raise
+        return job_id
+
+    @classmethod
+    def _insert(cls, job_id, user_id, kind, pages, params, now, expires_at):
+        # Pages first, so a worker never claims a job whose uploads are not there yet
+        cls.pages_collection().insert_many([
+            {"job_id": job_id, "number": number, "data": Binary(image_bytes), "digest": digest, "expires_at": expires_at}
+            for number, (image_bytes, digest) in enumerate(pages, 1)
+        ])
+        cls.collection().insert_one({
+            "_id": job_id,
+            "user_id": user_id,
+            "kind": kind,
+            "status": "queued",
+            "params": params or {},
+            "progress": {"done": 0, "total": len(pages)},
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "available_at": now,
+            # Jobs nobody ever runs are dropped too; finishing resets it to the result TTL
+            "expires_at": expires_at
+        })
+
+    @classmethod
+    def _take_slot(cls, user_id):
+        """
+        Count one more active job for the user in `job_slots` unless they are at the limit.
+        The check and the increment are one update, so parallel submits cannot all pass it.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            mongo.db.job_slots.find_one_and_update(
+                {"_id": user_id, "active": {"$lt": Config.JOB_MAX_ACTIVE_PER_USER}},
+                {"$inc": {"active": 1}, "$set": {"taken_at": now}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # The counter exists but is at the limit, so our upsert collided with it
+            pass
+        # A slot can leak (a queued job expired unrun, a process died mid-submit), so before
+        # refusing, bring the counter down to the jobs that are really active and retry once.
+        # Only once no slot was taken for SLOT_SETTLE_SECONDS: a fresh take may not have
+        # inserted its job yet. The compare on `active` keeps a concurrent release intact.
+        slots = mongo.db.job_slots.find_one({"_id": user_id})
+        if not slots or slots["taken_at"].replace(tzinfo=timezone.utc) > now - timedelta(seconds=SLOT_SETTLE_SECONDS):
+            return False
+        active = cls.active_count(user_id)
+        if active >= slots["active"]:
+            return False
+        mongo.db.job_slots.update_one({"_id": user_id, "active": slots["active"]}, {"$set": {"active": active}})
+        result = mongo.db.job_slots.update_one(
+            {"_id": user_id, "active": {"$lt": Config.JOB_MAX_ACTIVE_PER_USER}},
+            {"$inc": {"active": 1}, "$set": {"taken_at": now}}
+        )
+        return result.modified_count == 1
+
+    @classmethod
+    def _free_slot(cls, user_id):
+        mongo.db.job_slots.update_one({"_id": user_id, "active": {"$gt": 0}}, {"$inc": {"active": -1}})
+
+    @classmethod
+    def get_pages(cls, job_id):
+        """The job's uploads as (jpeg_bytes, digest) pairs, in page order."""
+        pages = cls.pages_collection().find({"job_id": job_id}).sort("number", 1)
+        return [(bytes(page["data"]), page["digest"]) for page in pages]
+
+    @classmethod
+    def active_count(cls, user_id):
+        return cls.collection().count_documents({"user_id": ObjectId(user_id), "status": {"$in": ACTIVE_STATUSES}})
+
+    @classmethod
+    def get(cls, job_id, user_id):
+        """The job if it exists and belongs to `user_id`, else None."""
+        if not ObjectId.is_valid(job_id):
+            return None
+        return cls.collection().find_one({"_id": ObjectId(job_id), "user_id": ObjectId(user_id)})
+
+    @classmethod
+    def claim(cls, now=None):
+        """
+        Claim the oldest available job (queued, or running on a worker that stopped reporting).
+        Each claim gets a fresh `claim_id`; progress, heartbeats and the result are only
+        written under it, so a worker whose job was re-claimed elsewhere cannot overwrite it.
+        """
+        now = now or datetime.now(timezone.utc)
+        return cls.collection().find_one_and_update(
+            {"status": {"$in": ACTIVE_STATUSES}, "available_at": {"$lte": now}},
+            {
+                "$set": {
+                    "status": "running",
+                    "claim_id": ObjectId(),
+                    "available_at": now + timedelta(seconds=Config.JOB_CLAIM_TIMEOUT),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @classmethod
+    def _claimed(cls, job):
+        return {"_id": job["_id"], "status": "running", "claim_id": job["claim_id"]}
+
+    @classmethod
+    def heartbeat(cls, job, fields=None):
+        """Extend the claim on `job` (and set `fields`). Returns False if the claim was lost."""
+        now = datetime.now(timezone.utc)
+        result = cls.collection().update_one(cls._claimed(job), {"$set": dict(
+            fields or {}, updated_at=now, available_at=now + timedelta(seconds=Config.JOB_CLAIM_TIMEOUT)
+        )})
+        return result.matched_count == 1
+
+    @classmethod
+    def set_progress(cls, job, done, total):
+        """Record progress and extend the claim, since the worker is evidently alive."""
+        cls.heartbeat(job, {"progress": {"done": done, "total": total}})
+
+    @classmethod
+    def _finish(cls, job, fields):
+        now = datetime.now(timezone.utc)
+        result = cls.collection().update_one(cls._claimed(job), {
+            "$set": dict(fields, updated_at=now, finished_at=now, expires_at=now + timedelta(seconds=Config.JOB_RESULT_TTL)),
+            "$unset": {"available_at": "", "claim_id": ""}
+        })
+        if result.modified_count:  # Only the worker that ends the job hands its slot back
+            cls._free_slot(job["user_id"])
+            cls.pages_collection().delete_many({"job_id": job["_id"]})  # The uploads are not needed anymore
+
+    @classmethod
+    def complete(cls, job, result):
+        cls._finish(job, {"status": "done", "result": result})
+
+    @classmethod
+    def fail(cls, job, error):
+        cls._finish(job, {"status": "failed", "error": str(error)})
+
+
+def job_public(job):
+    """Client view of a job: no uploads, no scheduling fields."""
+    public = {
+        "id": str(job["_id"]),
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job.get("progress"),
+        "created_at": job["created_at"],
+    }
+    if job.get("finished_at"):
+        public["finished_at"] = job["finished_at"]
+    if job["status"] == "done":
+        public["result"] = job.get("result")
+    elif job["status"] == "failed":
+        public["error"] = job.get("error")
+    return public
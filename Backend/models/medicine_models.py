@@ -1,10 +1,12 @@
 from database import mongo
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from bson import ObjectId
-import schedule
-import time
+from config import Config
+from models.reminder_models import Reminder, medicine_expires_at
+from models.pagination import paginate, to_public
+from models.user_migration import ensure_user_migrated, ensure_users_migrated
 import re
-import threading
+import time
 
 
 def extract_number(value):
@@ -12,10 +14,24 @@ def extract_number(value):
           match = re.search(r"\d+", value)
           return int(match.group()) if match else None
 class Medicine:
+    """
+    Medicines live in the `medicines` collection, one document per entry, with
+    `list` set to "saved" or "current" (formerly the saved_medicines/current_medicines arrays).
+    """
+
+    @classmethod
+    def collection(cls):
+        return mongo.db.medicines
+
+    @classmethod
+    def _insert(cls, user_id, medicine, lists):
+        docs = [dict(medicine, user_id=ObjectId(user_id), list=list_name) for list_name in lists]
+        cls.collection().insert_many(docs)
+        return docs
 
     @classmethod
     def add_medicine(cls, user_id, name, consulting_date, dosage_period, num_medicines, interval, times):
-        """ Add medicine details to a user's current_medicines and saved_medicines """
+        """ Add medicine details to a user's current and saved medicines """
         medicine = {
             "name": name,
             "consulting_date": datetime.strptime(consulting_date, "%Y-%m-%d"),
@@ -27,58 +43,90 @@ class Medicine:
             "times": times,  # list of times (e.g., ["08:00", "14:00", "20:00"])
             "created_at": datetime.now(timezone.utc)
         }
+        medicine["expires_at"] = medicine_expires_at(medicine)
 
-        mongo.db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$push": {"saved_medicines": medicine, "current_medicines": medicine}}
-        )
+        cls._insert(user_id, medicine, ("saved", "current"))
+        Reminder.add_for_medicine(user_id, medicine)
         return medicine
 
+    @classmethod
+    def add_current_medicine(cls, user_id, medicine):
+         """ Add a medicine to the user's current medicines only """
+         medicine = dict(medicine, expires_at=medicine_expires_at(medicine))
+         cls._insert(user_id, medicine, ("current",))
+         return medicine
+
+    @classmethod
+    def save_medicine(cls, user_id, medicine_details):
+         """ Add medicine details (as returned by /medicine/<name>) to the user's saved medicines """
+         cls._insert(user_id, dict(medicine_details, created_at=datetime.now(timezone.utc)), ("saved",))
+         return True
 
     @classmethod
-    def get_current_medicines(cls, user_id):
+    def get_saved_medicines(cls, user_id, limit=None, after=None):
+         """ Saved medicines in the order they were added, `limit` at a time after cursor `after` """
+         ensure_user_migrated(user_id)
+         docs = paginate(cls.collection(), {"user_id": ObjectId(user_id), "list": "saved"}, limit, after)
+         return [to_public(doc) for doc in docs]
+
+    @classmethod
+    def get_current_medicines(cls, user_id, limit=None, after=None):
          """ Get all active medicines for a user """
-         user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"current_medicines": 1})
-         return user.get("current_medicines", []) if user else []
+         ensure_user_migrated(user_id)
+         docs = paginate(cls.collection(), {"user_id": ObjectId(user_id), "list": "current"}, limit, after)
+         return [to_public(doc) for doc in docs]
+
+    @classmethod
+    def get_for_users(cls, user_ids):
+         """ Saved and current medicines of many users in one query: {user id: {"saved": [...], "current": [...]}} """
+         ensure_users_migrated(user_ids)
+         grouped = {str(user_id): {"saved": [], "current": []} for user_id in user_ids}
+         docs = cls.collection().find({"user_id": {"$in": [ObjectId(user_id) for user_id in user_ids]}}).sort("_id", 1)
+         for doc in docs:
+             grouped[str(doc["user_id"])][doc["list"]].append(to_public(doc))
+         return grouped
 
     @classmethod
     def delete_medicine(cls, user_id, medicine_name):
-         """ Delete a specific medicine from both saved_medicines and current_medicines """
-         mongo.db.users.update_one(
-             {"_id": ObjectId(user_id)},
-             {
-                 "$pull": {
-                     "saved_medicines": {"name": medicine_name},
-                     "current_medicines": {"name": medicine_name}
-                 }
-             }
-         )
+         """ Delete a specific medicine from both saved and current medicines """
+         ensure_user_migrated(user_id)
+         cls.collection().delete_many({"user_id": ObjectId(user_id), "name": medicine_name})
+         Reminder.remove_for_medicine(user_id, medicine_name)
          return True
 
     @classmethod
-    def clean_expired_medicines(cls):
-         """ Remove medicines from current_medicines after the dosage period is over """
-         users = mongo.db.users.find()
-         for user in users:
-             user_id = user["_id"]
-             updated_medicines = [
-                 med for med in user.get("current_medicines", [])
-                 if med["consulting_date"] + timedelta(days=med["dosage_period"]) > datetime.now(timezone.utc)
-             ]
-
-             mongo.db.users.update_one(
-                 {"_id": ObjectId(user_id)},
-                 {"$set": {"current_medicines": updated_medicines}}
-             )
-
-
- # Schedule the cleanup job
-def schedule_cleanup():
-     schedule.every().day.at("00:00").do(Medicine.clean_expired_medicines)
-    
-     while True:
-         schedule.run_pending()
-         time.sleep(60)  # Check every minute
-
-# # Run in a separate thread
-threading.Thread(target=schedule_cleanup, daemon=True).start()
\ No newline at end of file
+    def backfill_expires_at(cls):
+        """ Precompute expires_at on current medicines stored before it existed (server-side, one command) """
+        return cls.collection().update_many(
+            {
+                "list": "current",
+                "expires_at": {"$exists": False},
+                "consulting_date": {"$type": "date"},
+                "dosage_period": {"$type": "number"}
+            },
+            [{"$set": {"expires_at": {
+                "$add": ["$consulting_date", {"$multiply": ["$dosage_period", 24 * 3600 * 1000]}]
+            }}}]
+        ).modified_count
+
+    @classmethod
+    def clean_expired_medicines(cls, now=None):
+         """
+         Remove current medicines after the dosage period is over.
+         Only expired entries are read (via the list+expires_at index) and they are deleted in
+         batches of MEDICINE_EXPIRY_BATCH_SIZE, so this can run every few minutes.
+         """
+         now = now or datetime.now(timezone.utc)
+         expired = {"list": "current", "expires_at": {"$type": "date", "$lte": now}}
+         cleaned = 0
+
+         while True:
+             ids = [doc["_id"] for doc in cls.collection().find(expired, {"_id": 1}).limit(Config.MEDICINE_EXPIRY_BATCH_SIZE)]
+             if not ids:
+                 break
+
+             cleaned += cls.collection().delete_many({"_id": {"$in": ids}}).deleted_count
+             time.sleep(Config.MEDICINE_EXPIRY_BATCH_PAUSE)  # Spread the writes out
+
+         Reminder.remove_expired(now)
+         return cleaned
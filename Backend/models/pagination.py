@@ -0,0 +1,47 @@
+from bson import ObjectId
+from config import Config
+
+# Internal bookkeeping fields that are never returned to clients
+HIDDEN_FIELDS = ("user_id", "list", "legacy_key")
+
+
+def page_cursor(collection, query, limit=None, after=None, projection=None, batch_size=None):
+    """Mongo cursor over the documents with _id greater than `after`, in insertion order."""
+    if after:
+        query = dict(query, _id={"$gt": ObjectId(after)})
+    cursor = collection.find(query, projection).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    if batch_size:
+        cursor = cursor.batch_size(batch_size)
+    return cursor
+
+
+def paginate(collection, query, limit=None, after=None, projection=None):
+    """Keyset pagination in insertion order: documents with _id greater than `after`."""
+    return list(page_cursor(collection, query, limit, after, projection))
+
+
+def to_public(doc):
+    """Copy of `doc` with a string `id` instead of `_id` and without bookkeeping fields."""
+    doc = dict(doc)
+    doc["id"] = str(doc.pop("_id"))
+    for field in HIDDEN_FIELDS:
+        doc.pop(field, None)
+    return doc
+
+
+def parse_page_args(args):
+    """Read ?limit= and ?after= from a request. Raises ValueError on bad input."""
+    limit = args.get("limit", Config.PAGE_SIZE, type=int)
+    if not limit or limit < 1:
+        raise ValueError("limit must be a positive integer")
+    after = args.get("after")
+    if after and not ObjectId.is_valid(after):
+        raise ValueError("Invalid cursor")
+    return min(limit, Config.MAX_PAGE_SIZE), after
+
+
+def next_cursor(items, limit):
+    """Cursor for the page after `items`, or None when it was the last page."""
+    return items[-1]["id"] if limit and len(items) == limit else None
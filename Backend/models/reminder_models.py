@@ -0,0 +1,180 @@
+from database import mongo
+from datetime import datetime, timedelta, timezone
+from config import Config
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from utils.leases import shard_for
+import pytz
+import re
+
+CANONICAL_TIME_RE = re.compile(r"^\d{2}:\d{2}$")
+
+
+def parse_reminder_time(value):
+    """Parse "08:00" / "8:00 AM" style times into (hour, minute), or None if unparseable."""
+    for fmt in ("%H:%M", "%I:%M %p", "%I:%M%p"):
+        try:
+            parsed = datetime.strptime(value.strip().upper(), fmt)
+            return parsed.hour, parsed.minute
+        except (AttributeError, ValueError):
+            continue
+    return None
+
+
+def canonical_reminder_time(value):
+    """`value` as "HH:MM" (24-hour), so "8:00 AM" and "08:00" are the same reminder; None if unparseable."""
+    parsed = parse_reminder_time(value)
+    return "%02d:%02d" % parsed if parsed else None
+
+
+def next_fire_time(hour, minute, after):
+    """Next occurrence of hour:minute (in REMINDER_TIMEZONE) strictly after `after`, as UTC."""
+    tz = pytz.timezone(Config.REMINDER_TIMEZONE)
+    local_now = after.astimezone(tz)
+    day = local_now.date()
+    while True:
+        candidate = tz.localize(datetime(day.year, day.month, day.day, hour, minute))
+        if candidate > local_now:
+            return candidate.astimezone(timezone.utc)
+        day += timedelta(days=1)
+
+
+def medicine_expires_at(medicine):
+    """When a current medicine's dosage period is over (None if it cannot be determined)."""
+    try:
+        consulting_date = medicine["consulting_date"]
+        if consulting_date.tzinfo is None:
+            consulting_date = consulting_date.replace(tzinfo=timezone.utc)
+        return consulting_date + timedelta(days=int(medicine["dosage_period"]))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+class Reminder:
+    """
+    One document per (user, medicine, time of day) in the `reminders` collection, the time
+    stored as canonical "HH:MM" (canonical_reminder_time).
+    `next_fire_at` is indexed so the dispatcher only ever reads reminders that are due, and
+    `shard` (a stable hash of the user id) lets several dispatchers split the work.
+    """
+
+    @classmethod
+    def collection(cls):
+        return mongo.db.reminders
+
+    @classmethod
+    def add_for_medicine(cls, user_id, medicine, now=None):
+        """Create (or refresh) the reminders for every time in `medicine["times"]`. Returns the earliest fire time."""
+        now = now or datetime.now(timezone.utc)
+        expires_at = medicine_expires_at(medicine)
+        earliest = None
+
+        for time_str in medicine.get("times") or []:
+            parsed = parse_reminder_time(time_str)
+            if parsed is None:
+                print(f"Skipping reminder with invalid time {time_str!r} for {medicine.get('name')}")
+                continue
+            fire_at = next_fire_time(*parsed, now)
+            if expires_at and fire_at >= expires_at:
+                continue
+            cls.collection().update_one(
+                {"user_id": str(user_id), "medicine_name": medicine["name"], "time": "%02d:%02d" % parsed},
+                {"$set": {
+                    "next_fire_at": fire_at,
+                    "expires_at": expires_at,
+                    "shard": shard_for(user_id, Config.REMINDER_SHARDS)
+                }},
+                upsert=True
+            )
+            earliest = fire_at if earliest is None else min(earliest, fire_at)
+
+        return earliest
+
+    @classmethod
+    def remove_for_medicine(cls, user_id, medicine_name):
+        return cls.collection().delete_many({"user_id": str(user_id), "medicine_name": medicine_name})
+
+    @classmethod
+    def remove_expired(cls, now=None, shards=None):
+        now = now or datetime.now(timezone.utc)
+        query = {"expires_at": {"$type": "date", "$lte": now}}
+        if shards is not None:
+            query["shard"] = {"$in": shards}
+        return cls.collection().delete_many(query)
+
+    @classmethod
+    def next_due_at(cls, shards):
+        """Fire time of the earliest pending reminder in `shards`, or None if there are none."""
+        doc = cls.collection().find_one(
+            {"shard": {"$in": shards}}, {"next_fire_at": 1}, sort=[("next_fire_at", ASCENDING)]
+        )
+        return doc["next_fire_at"].replace(tzinfo=timezone.utc) if doc else None
+
+    @classmethod
+    def assign_shards(cls):
+        """Set `shard` on reminders that predate sharding or were hashed with another REMINDER_SHARDS."""
+        count = 0
+        stale = {"$or": [{"shard": {"$exists": False}}, {"shard": {"$gte": Config.REMINDER_SHARDS}}]}
+        for reminder in cls.collection().find(stale, {"user_id": 1}):
+            cls.collection().update_one(
+                {"_id": reminder["_id"]},
+                {"$set": {"shard": shard_for(reminder["user_id"], Config.REMINDER_SHARDS)}}
+            )
+            count += 1
+        return count
+
+    @classmethod
+    def canonicalize_times(cls):
+        """
+        Rewrite reminders stored under a raw time ("8:00 AM") to "HH:MM". Where that reminder
+        already exists under the canonical time, the duplicate is dropped. Returns the number
+        of reminders rewritten or dropped.
+        """
+        count = 0
+        for reminder in cls.collection().find({"time": {"$not": CANONICAL_TIME_RE}}, {"time": 1}):
+            canonical = canonical_reminder_time(reminder["time"])
+            count += 1
+            if canonical is not None:
+                try:
+                    cls.collection().update_one({"_id": reminder["_id"]}, {"$set": {"time": canonical}})
+                    continue
+                except DuplicateKeyError:
+                    pass  # Already scheduled under the canonical time
+            # A duplicate, or a time that could never fire
+            cls.collection().delete_one({"_id": reminder["_id"]})
+        return count
+
+    @classmethod
+    def claim_due(cls, now, limit, shards):
+        """
+        Return up to `limit` due reminders, advancing each one to its next occurrence.
+        The update is conditional on the old fire time, so a reminder is only claimed once.
+        """
+        claimed = []
+        due = cls.collection().find(
+            {"shard": {"$in": shards}, "next_fire_at": {"$lte": now}},
+            sort=[("next_fire_at", ASCENDING)],
+            limit=limit
+        )
+        for reminder in due:
+            parsed = parse_reminder_time(reminder["time"])
+            if parsed is None:
+                cls.collection().delete_one({"_id": reminder["_id"]})
+                continue
+            result = cls.collection().update_one(
+                {"_id": reminder["_id"], "next_fire_at": reminder["next_fire_at"]},
+                {"$set": {"next_fire_at": next_fire_time(*parsed, now)}}
+            )
+            if result.modified_count:
+                reminder["scheduled_for"] = reminder["next_fire_at"].replace(tzinfo=timezone.utc)
+                claimed.append(reminder)
+        return claimed
+
+    @classmethod
+    def backfill_from_users(cls):
+        """Build reminders from every current medicine (one-off, for existing data)."""
+        count = 0
+        for medicine in mongo.db.medicines.find({"list": "current", "times.0": {"$exists": True}}):
+            if medicine.get("name") and cls.add_for_medicine(medicine["user_id"], medicine):
+                count += 1
+        return count
@@ -0,0 +1,31 @@
+from flask import g, has_request_context
+
+from models.user_models import User
+
+
+def _request_cache(view):
+    """Per-request {user id: user} cache for `view`; a throwaway dict outside a request."""
+    if not has_request_context():
+        return {}
+    caches = g.setdefault("user_loader_cache", {})
+    key = view if isinstance(view, str) else repr(sorted(view.items()))
+    return caches.setdefault(key, {})
+
+
+def load_users(user_ids, view="dashboard"):
+    """
+    Resolve many user ids with a single `$in` query (projected to `view`) and keep the
+    results for the rest of the request. Returns {user id string: user}; ids that do not
+    exist are left out.
+    """
+    cache = _request_cache(view)
+    missing = {str(user_id) for user_id in user_ids} - cache.keys()
+    if missing:
+        found = User.get_many(missing, view)
+        for user_id in missing:
+            cache[user_id] = found.get(user_id)
+    return {str(user_id): cache[str(user_id)] for user_id in user_ids if cache.get(str(user_id))}
+
+
+def load_user(user_id, view="dashboard"):
+    return load_users([user_id], view).get(str(user_id))
@@ -0,0 +1,154 @@
+from database import mongo
+from bson import ObjectId
+from pymongo import UpdateOne
+from config import Config
+from models.reminder_models import medicine_expires_at
+from datetime import datetime, timedelta, timezone
+from utils.token_utils import hash_otp
+import time
+
+# Arrays that used to be embedded in every user document
+LEGACY_FIELDS = ("saved_medicines", "current_medicines", "reports", "otps", "access_requests", "authorized_patients")
+LEGACY_QUERY = {"$or": [{field: {"$exists": True}} for field in LEGACY_FIELDS]}
+
+_migrated = set()  # Users this process already knows to be migrated
+
+
+def _object_id(value):
+    return ObjectId(str(value)) if ObjectId.is_valid(str(value)) else None
+
+
+def _legacy_upserts(user, field, build):
+    """Upserts keyed on the entry's position, so re-running a migration never duplicates it."""
+    ops = []
+    for index, entry in enumerate(user.get(field) or []):
+        if not isinstance(entry, dict):
+            continue
+        doc = build(entry)
+        doc["legacy_key"] = f"{user['_id']}:{field}:{index}"
+        ops.append(UpdateOne({"legacy_key": doc["legacy_key"]}, {"$setOnInsert": doc}, upsert=True))
+    return ops
+
+
+def migrate_user(user):
+    """
+    Move one user's embedded arrays into the medicines, reports, otps, access_requests and
+    patient_links collections, then drop them from the user document.
+    The arrays are only removed if they did not change while being copied.
+    """
+    user_id = user["_id"]
+
+    def medicine(list_name):
+        def build(entry):
+            doc = dict(entry, user_id=user_id, list=list_name)
+            doc.setdefault("created_at", user.get("created_at"))
+            if list_name == "current" and "expires_at" not in doc:
+                doc["expires_at"] = medicine_expires_at(doc)
+            return doc
+        return build
+
+    medicines = (
+        _legacy_upserts(user, "saved_medicines", medicine("saved"))
+        + _legacy_upserts(user, "current_medicines", medicine("current"))
+    )
+    reports = _legacy_upserts(user, "reports", lambda entry: dict(entry, user_id=user_id))
+    def otp(entry):
+        # Legacy OTPs were stored in clear text and never expired
+        created_at = entry.get("created_at") or datetime.now(timezone.utc)
+        return {
+            "user_id": user_id,
+            "email": user.get("email"),
+            "otp_hash": hash_otp(user.get("email"), entry.get("otp")),
+            "created_at": created_at,
+            "expires_at": created_at + timedelta(seconds=Config.OTP_TTL),
+            "verified": entry.get("verified", False)
+        }
+
+    otps = _legacy_upserts(user, "otps", otp)
+
+    access_requests = []
+    for entry in user.get("access_requests") or []:
+        patient_id = _object_id(entry.get("patient_id")) if isinstance(entry, dict) else None
+        if patient_id:
+            access_requests.append(UpdateOne(
+                {"doctor_id": user_id, "patient_id": patient_id},
+                {"$setOnInsert": {"requested_at": entry.get("requested_at")}},
+                upsert=True
+            ))
+
+    patient_links = []
+    for patient in user.get("authorized_patients") or []:
+        patient_id = _object_id(patient)
+        if patient_id:
+            patient_links.append(UpdateOne(
+                {"doctor_id": user_id, "patient_id": patient_id},
+                {"$setOnInsert": {"granted_at": user.get("updated_at")}},
+                upsert=True
+            ))
+
+    for collection, ops in (
+        (mongo.db.medicines, medicines),
+        (mongo.db.reports, reports),
+        (mongo.db.otps, otps),
+        (mongo.db.access_requests, access_requests),
+        (mongo.db.patient_links, patient_links),
+    ):
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+
+    unchanged = {"_id": user_id}
+    for field in LEGACY_FIELDS:
+        unchanged[field] = user[field] if field in user else {"$exists": False}
+    result = mongo.db.users.update_one(unchanged, {"$unset": {field: "" for field in LEGACY_FIELDS}})
+    return result.modified_count == 1
+
+
+def ensure_user_migrated(user_id):
+    """Migrate `user_id` on first access, so un-migrated users keep working during the online migration."""
+    if Config.USER_ARRAYS_MIGRATED or str(user_id) in _migrated:
+        return
+    projection = dict.fromkeys(LEGACY_FIELDS + ("email", "created_at", "updated_at"), 1)
+    for _ in range(3):
+        user = mongo.db.users.find_one(dict(LEGACY_QUERY, _id=ObjectId(user_id)), projection)
+        if not user or migrate_user(user):
+            break
+    if len(_migrated) > 100000:
+        _migrated.clear()
+    _migrated.add(str(user_id))
+
+
+def ensure_users_migrated(user_ids):
+    """ensure_user_migrated for many users, finding the ones still to migrate in one query."""
+    if Config.USER_ARRAYS_MIGRATED:
+        return
+    pending = {str(user_id) for user_id in user_ids} - _migrated
+    if not pending:
+        return
+    projection = dict.fromkeys(LEGACY_FIELDS + ("email", "created_at", "updated_at"), 1)
+    query = dict(LEGACY_QUERY, _id={"$in": [ObjectId(user_id) for user_id in pending]})
+    for user in mongo.db.users.find(query, projection):
+        if not migrate_user(user):
+            ensure_user_migrated(user["_id"])  # Changed while copying, retry on its own
+    _migrated.update(pending)
+
+
+def migrate_all(batch_size=None, pause=None):
+    """Migrate every user still carrying embedded arrays, one batch at a time. Returns the count."""
+    batch_size = batch_size or Config.MIGRATION_BATCH_SIZE
+    pause = Config.MIGRATION_BATCH_PAUSE if pause is None else pause
+    projection = dict.fromkeys(LEGACY_FIELDS + ("email", "created_at", "updated_at"), 1)
+    migrated, failed = 0, []
+
+    while True:
+        query = dict(LEGACY_QUERY, _id={"$nin": failed}) if failed else LEGACY_QUERY
+        users = list(mongo.db.users.find(query, projection).limit(batch_size))
+        if not users:
+            return migrated
+        for user in users:
+            try:
+                if migrate_user(user):
+                    migrated += 1
+            except Exception as e:
+                print(f"Failed to migrate user {user['_id']}: {e}")
+                failed.append(user["_id"])
+        time.sleep(pause)  # Leave room for regular traffic
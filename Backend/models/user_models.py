@@ -1,32 +1,71 @@
 from database import mongo
-from datetime import datetime, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
-import random
-from bson.regex import Regex
+from pymongo import UpdateOne
+from models.pagination import page_cursor, paginate, to_public
+from models.user_migration import LEGACY_FIELDS, ensure_user_migrated, ensure_users_migrated
+from models.medicine_models import Medicine
+from utils.token_utils import hash_otp
+from utils.password_hashing import check_password, hash_password, needs_rehash
+from config import Config
+import secrets
 import re
+import unicodedata
+
+# Named projections for the user accessors, so callers only fetch the fields they use
+VIEWS = {
+    'auth': {'email': 1, 'password': 1, 'role': 1},  # Login / password checks
+    'role': {'role': 1},  # Existence and role checks
+    'dashboard': {'name': 1, 'email': 1, 'role': 1},  # Lists of patients / requests
+    'profile': dict({'password': 0, 'name_tokens': 0}, **dict.fromkeys(LEGACY_FIELDS, 0)),  # Everything shown on a profile page
+}
+
+
+def name_tokens(name):
+    """Lower-cased, accent-folded words of a name ("José  Núñez" -> ["jose", "nunez"])."""
+    folded = unicodedata.normalize('NFKD', str(name or ''))
+    folded = ''.join(char for char in folded if not unicodedata.combining(char)).lower()
+    return re.findall(r'\w+', folded)
+
+
+def _prefix_range(prefix):
+    """Index range matching every token that starts with `prefix`."""
+    return {'$gte': prefix, '$lt': prefix + '\uffff'}
+
+
+def resolve_projection(projection):
+    """Turn a view name (see VIEWS) or a plain projection dict into a projection."""
+    if projection is None or isinstance(projection, dict):
+        return projection
+    try:
+        return VIEWS[projection]
+    except KeyError:
+        raise ValueError(f"Unknown user view: {projection}")
+
 
 class User:
+    """
+    User accounts (`users`). Reports, OTPs, access requests and authorized patients are kept
+    in their own collections (`reports`, `otps`, `access_requests`, `patient_links`) rather
+    than as arrays inside the user document.
+    Accessors take a `projection`: a view name from VIEWS or a projection dict.
+    """
+
     @classmethod
     def create(cls, name, email, password, role):
         if role not in ["patient", "doctor"]:
             raise ValueError("Role must be either 'patient' or 'doctor'.")
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)  # May raise HashingOverloaded
 
         user = {
             'name': name,
+            'name_tokens': name_tokens(name),
             'email': email,
             'password': hashed_password,
             'role': role,  #   Add role field
             'created_at': datetime.now(timezone.utc),
             'updated_at': datetime.now(timezone.utc),
-            'saved_medicines': [],
-            'reports':[],
-            'access_requests':[],
-            'otps': [],
-            'authorized_patients':[],
-            'current_medicines': [],
             'fcm_token': None
         }
 
@@ -34,16 +73,47 @@ class User:
         return result.inserted_id
 
     @classmethod
-    def get_by_email(cls, email):
-        return mongo.db.users.find_one({'email': email})
+    def get_by_email(cls, email, projection=None):
+        return mongo.db.users.find_one({'email': email}, resolve_projection(projection))
+
+    @classmethod
+    def get_by_id(cls, user_id, projection=None):
+        return mongo.db.users.find_one({'_id': ObjectId(user_id)}, resolve_projection(projection))
+
+    @classmethod
+    def exists(cls, user_id):
+        return mongo.db.users.count_documents({'_id': ObjectId(user_id)}, limit=1) > 0
 
     @classmethod
-    def get_by_id(cls, user_id):
-        return mongo.db.users.find_one({'_id': ObjectId(user_id)})
+    def get_many(cls, user_ids, projection=None):
+        """Fetch several users in one query. Returns a dict keyed by the string user id."""
+        ids = [ObjectId(user_id) for user_id in set(map(str, user_ids))]
+        users = mongo.db.users.find({'_id': {'$in': ids}}, resolve_projection(projection))
+        return {str(user['_id']): user for user in users}
 
     @staticmethod
     def verify_password(stored_password, password):
-        return check_password_hash(stored_password, password)
+        return check_password(stored_password, password)
+
+    @classmethod
+    def set_password(cls, user_id, password):
+        return cls.set_password_hash(user_id, hash_password(password))
+
+    @classmethod
+    def set_password_hash(cls, user_id, password_hash):
+        """Store a password already hashed with hash_password()."""
+        return cls.update(user_id, {'$set': {'password': password_hash, 'updated_at': datetime.now(timezone.utc)}})
+
+    @classmethod
+    def rehash_if_needed(cls, user, password):
+        """After a successful login, re-hash a password stored with outdated PASSWORD_HASH_METHOD parameters."""
+        if not needs_rehash(user['password']):
+            return False
+        mongo.db.users.update_one(
+            {'_id': user['_id'], 'password': user['password']},  # Unless it changed in the meantime
+            {'$set': {'password': hash_password(password)}}
+        )
+        return True
 
     @classmethod
     def update(cls, user_id, update_data):
@@ -56,52 +126,55 @@ class User:
 
     @classmethod
     def generate_otp(cls, email):
-        user = cls.get_by_email(email)
+        user = cls.get_by_email(email, {'_id': 1})
         if not user:
             return None
 
-        otp = str(random.randint(100000, 999999))  # Generate a 6-digit OTP
+        otp = str(secrets.randbelow(900000) + 100000)  # Generate a 6-digit OTP
+        now = datetime.now(timezone.utc)
         otp_entry = {
-            "otp": otp,
-            "created_at": datetime.now(timezone.utc),
+            "user_id": user["_id"],
+            "email": email,
+            "otp_hash": hash_otp(email, otp),  # Only the hash is stored
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=Config.OTP_TTL),  # Removed by the TTL index
             "verified": False  #   Track whether OTP was used
         }
 
-        mongo.db.users.update_one(
-            {"email": email},
-            {"$push": {"otps": otp_entry}}
-        )
+        mongo.db.otps.insert_one(otp_entry)
 
         return otp
 
-    @classmethod
-    def get_latest_otp(cls, email):
-        user = cls.get_by_email(email)
-        if not user or "otps" not in user or not user["otps"]:
-            return None
-
-        return user["otps"][-1]  #   Get the last OTP entry
-
     @classmethod
     def get_all_users(cls):
         return mongo.db.users.find()
 
     @classmethod
-    def verify_otp(cls, email, otp):
-        user = cls.get_by_email(email)
-        if not user or "otps" not in user:
-            return False
+    def _usable_otp(cls, email, otp):
+        return {
+            "email": email,
+            "otp_hash": hash_otp(email, otp),
+            "verified": False,
+            "expires_at": {"$gt": datetime.now(timezone.utc)}  # The TTL monitor only runs every minute
+        }
 
-        for otp_entry in user["otps"]:
-            if otp_entry["otp"] == otp and not otp_entry["verified"]:
-                otp_entry["verified"] = True  #   Mark OTP as used
-                mongo.db.users.update_one(
-                    {"email": email},
-                    {"$set": {"otps": user["otps"]}}
-                )
-                return True
+    @classmethod
+    def check_otp(cls, email, otp):
+        """True if `otp` is a matching unused, unexpired OTP; it stays usable (see verify_otp)."""
+        return mongo.db.otps.find_one(cls._usable_otp(email, otp), {"_id": 1}) is not None
 
-        return False
+    @classmethod
+    def verify_otp(cls, email, otp):
+        """
+        Mark a matching unused, unexpired OTP as used in one atomic round trip, so an OTP can
+        only be redeemed once even under concurrent attempts.
+        """
+        otp_entry = mongo.db.otps.find_one_and_update(
+            cls._usable_otp(email, otp),
+            {"$set": {"verified": True, "verified_at": datetime.now(timezone.utc)}},
+            projection={"_id": 1}
+        )
+        return otp_entry is not None
 
     @classmethod
     def save_fcm_token(cls, user_id, fcm_token):
@@ -113,38 +186,153 @@ class User:
         )
         
     @classmethod
-    def find_by_role_and_name(cls, role, name_query):
-     """Find users by role and search for their name (case-insensitive)."""
-     doctors = mongo.db.users.find(
-        {'role': role, 'name': {'$regex': Regex(name_query, 'i')}},  #   Case-insensitive search
-        {'password': 0}  # Exclude password from results
-     )
-
-     return [
-        {
-            'doctor_id': str(doctor['_id']),  #   Send `doctor_id` (user_id)
-            'name': doctor['name'],
-            'email': doctor['email']
-        }
-        for doctor in doctors
-    ]
+    def find_by_role_and_name(cls, role, name_query, limit=None):
+        """
+        Users with `role` having a name word starting with each word of `name_query`, best
+        matches first. Every query word is an index range scan over (role, name_tokens), and
+        at most DOCTOR_SEARCH_CANDIDATES users are read before ranking.
+        """
+        query_tokens = name_tokens(name_query)[:5]
+        if not query_tokens:
+            return []
+
+        candidates = mongo.db.users.find(
+            {'role': role, '$and': [{'name_tokens': {'$elemMatch': _prefix_range(token)}} for token in query_tokens]},
+            dict(VIEWS['dashboard'], name_tokens=1)
+        ).limit(Config.DOCTOR_SEARCH_CANDIDATES)
+
+        def relevance(doctor):
+            tokens = doctor.get('name_tokens') or []
+            exact = sum(token in tokens for token in query_tokens)
+            starts_name = bool(tokens) and tokens[0].startswith(query_tokens[0])
+            return (-exact, not starts_name, len(doctor.get('name', '')), doctor.get('name', ''))
+
+        ranked = sorted(candidates, key=relevance)[:limit or Config.DOCTOR_SEARCH_LIMIT]
+        return [
+            {
+                'doctor_id': str(doctor['_id']),  #   Send `doctor_id` (user_id)
+                'name': doctor['name'],
+                'email': doctor['email']
+            }
+            for doctor in ranked
+        ]
+
+    @classmethod
+    def backfill_name_tokens(cls):
+        """Set name_tokens on users created before it existed. Returns the number updated."""
+        updated = 0
+        while True:
+            users = list(mongo.db.users.find({'name_tokens': {'$exists': False}}, {'name': 1}).limit(500))
+            if not users:
+                return updated
+            mongo.db.users.bulk_write([
+                UpdateOne({'_id': user['_id']}, {'$set': {'name_tokens': name_tokens(user.get('name'))}})
+                for user in users
+            ], ordered=False)
+            updated += len(users)
 
     @classmethod
-    def save_report(cls, user_id, report_summary, report_files):
+    def save_report(cls, user_id, report_summary, report_files=None, extracted_text=None):
         """Save summarized report and file details for a patient."""
         report_entry = {
+            "user_id": ObjectId(user_id),
             "summary": report_summary,
-            "files": report_files,
             "created_at": datetime.now(timezone.utc),
         }
+        if report_files is not None:
+            report_entry["files"] = report_files
+        if extracted_text is not None:
+            report_entry["extracted_text"] = extracted_text
+
+        mongo.db.reports.insert_one(report_entry)
+        return to_public(report_entry)
+
+    @classmethod
+    def get_reports(cls, user_id, limit=None, after=None):
+        """Retrieve a specific user's reports, oldest first, `limit` at a time after cursor `after`."""
+        ensure_user_migrated(user_id)
+        return [to_public(report) for report in paginate(mongo.db.reports, {'user_id': ObjectId(user_id)}, limit, after)]
+
+    @classmethod
+    def get_reports_for_users(cls, user_ids):
+        """Reports of many users in one query: {user id: [reports, oldest first]}."""
+        ensure_users_migrated(user_ids)
+        grouped = {str(user_id): [] for user_id in user_ids}
+        reports = mongo.db.reports.find({'user_id': {'$in': [ObjectId(user_id) for user_id in user_ids]}}).sort('_id', 1)
+        for report in reports:
+            grouped[str(report['user_id'])].append(to_public(report))
+        return grouped
 
-        return mongo.db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$push': {'reports': report_entry}}
+    @classmethod
+    def add_access_request(cls, doctor_id, patient_id):
+        """Record a patient's request to share their data with a doctor (at most one pending per pair)."""
+        mongo.db.access_requests.update_one(
+            {'doctor_id': ObjectId(doctor_id), 'patient_id': ObjectId(patient_id)},
+            {'$set': {'requested_at': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        return True
+
+    @classmethod
+    def get_access_requests(cls, doctor_id, limit=None, after=None):
+        """Pending access requests for a doctor, oldest first."""
+        ensure_user_migrated(doctor_id)
+        requests = paginate(mongo.db.access_requests, {'doctor_id': ObjectId(doctor_id)}, limit, after)
+        return [
+            dict(to_public(entry), doctor_id=str(entry['doctor_id']), patient_id=str(entry['patient_id']))
+            for entry in requests
+        ]
+
+    @classmethod
+    def accept_access_request(cls, doctor_id, patient_id):
+        """Remove the pending request and authorize the patient. Returns False if nothing changed."""
+        ensure_user_migrated(doctor_id)
+        doctor_id, patient_id = ObjectId(doctor_id), ObjectId(patient_id)
+        removed = mongo.db.access_requests.delete_one({'doctor_id': doctor_id, 'patient_id': patient_id})
+        linked = mongo.db.patient_links.update_one(
+            {'doctor_id': doctor_id, 'patient_id': patient_id},
+            {'$setOnInsert': {'granted_at': datetime.now(timezone.utc)}},
+            upsert=True
         )
+        return bool(removed.deleted_count or linked.upserted_id)
+
+    @classmethod
+    def get_authorized_patient_ids(cls, doctor_id, limit=None, after=None):
+        """Ids (as strings) of the patients who granted `doctor_id` access."""
+        ensure_user_migrated(doctor_id)
+        links = paginate(mongo.db.patient_links, {'doctor_id': ObjectId(doctor_id)}, limit, after, {'patient_id': 1})
+        return [str(link['patient_id']) for link in links]
+
+    @classmethod
+    def iter_patient_links(cls, doctor_id, limit=None, after=None, batch_size=None):
+        """Cursor over the doctor's patient links ({_id, patient_id}), fetched from Mongo as it is consumed."""
+        ensure_user_migrated(doctor_id)
+        return page_cursor(
+            mongo.db.patient_links, {'doctor_id': ObjectId(doctor_id)}, limit, after, {'patient_id': 1}, batch_size
+        )
+
+    @classmethod
+    def is_authorized(cls, doctor_id, patient_id):
+        ensure_user_migrated(doctor_id)
+        return mongo.db.patient_links.count_documents(
+            {'doctor_id': ObjectId(doctor_id), 'patient_id': ObjectId(patient_id)}, limit=1
+        ) > 0
 
     @classmethod
-    def get_reports(cls, user_id):
-        """Retrieve all reports for a specific user."""
-        user = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'reports': 1})
-        return user.get('reports', []) if user else []
+    def with_related(cls, user, limit=None):
+        """
+        The user document in the shape clients expect (string _id, no password or search tokens), with the
+        first `limit` saved/current medicines and reports, plus requests/patients for doctors.
+        """
+        user_id = user['_id']
+        user = dict(user, _id=str(user_id))
+        user.pop('password', None)
+        user.pop('name_tokens', None)  # Internal search keys
+        user.pop('otps', None)
+        user['saved_medicines'] = Medicine.get_saved_medicines(user_id, limit)
+        user['current_medicines'] = Medicine.get_current_medicines(user_id, limit)
+        user['reports'] = cls.get_reports(user_id, limit)
+        if user.get('role') == 'doctor':
+            user['access_requests'] = cls.get_access_requests(user_id, limit)
+            user['authorized_patients'] = cls.get_authorized_patient_ids(user_id, limit)
+        return user
@@ -1,11 +1,19 @@
-from flask import Blueprint, request, jsonify, url_for
+from flask import Blueprint, request, jsonify
 from models.user_models import User
-from utils.token_utils import generate_token, verify_token
+from utils.token_utils import generate_token
 from utils.email_utils import send_reset_email  # Function to send OTP via email
-from werkzeug.security import generate_password_hash
+from utils.password_hashing import HashingOverloaded, hash_password
+from pymongo.errors import DuplicateKeyError
 
 auth_routes = Blueprint('auth_routes', __name__)
 
+
+def overloaded():
+    """Shed load when the password hashing queue is full."""
+    response = jsonify({'message': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_routes.route('/signup', methods=['POST'])
 def signup():
     data = request.get_json()
@@ -20,10 +28,16 @@ def signup():
     if role not in ["patient", "doctor"]:
         return jsonify({'message': "Invalid role. Role must be either 'patient' or 'doctor'."}), 400
 
-    if User.get_by_email(email):
+    if User.get_by_email(email, {'_id': 1}):
         return jsonify({'message': 'User already exists'}), 400
 
-    user_id = User.create(name, email, password, role)
+    try:
+        user_id = User.create(name, email, password, role)
+    except DuplicateKeyError:
+        #   Another signup with the same email won the race (unique email index)
+        return jsonify({'message': 'User already exists'}), 400
+    except HashingOverloaded:
+        return overloaded()
     token = generate_token(user_id)
 
     return jsonify({'token': token, 'user_id': str(user_id), 'role': role}), 201
@@ -38,9 +52,18 @@ def login():
     if not email or not password:
         return jsonify({'message': 'Missing required fields'}), 400
 
-    user = User.get_by_email(email)
-    if not user or not User.verify_password(user['password'], password):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    user = User.get_by_email(email, 'auth')
+    try:
+        if not user or not User.verify_password(user['password'], password):
+            return jsonify({'message': 'Invalid credentials'}), 401
+    except HashingOverloaded:
+        return overloaded()
+
+    try:
+        User.rehash_if_needed(user, password)
+    except HashingOverloaded:
+        #   Best effort: the password is right, upgrade the hash on a later login
+        print(f"Skipped password rehash for {user['_id']}: hashing queue is busy")
 
     token = generate_token(user['_id'])
     return jsonify({'token': token, 'message': 'Login Successful'}), 200
@@ -57,14 +80,14 @@ def forget_password():
     if not email:
         return jsonify({'message': 'Email is required'}), 400
 
-    user = User.get_by_email(email)
+    user = User.get_by_email(email, {'_id': 1})
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
     otp = User.generate_otp(email)  #   Generate and store OTP inside the user's document
 
-    #   Send OTP via email
-    send_reset_email(email, f"Your OTP is: {otp}")
+    #   Queue the OTP email (sent in the background)
+    send_reset_email(email, otp)
 
     return jsonify({'message': 'OTP sent to your email'}), 200
 
@@ -85,17 +108,23 @@ def reset_password():
     if not email or not otp or not new_password:
         return jsonify({'message': 'Email, OTP, and new password are required'}), 400
 
-    #   Check OTP validity before updating password
-    if not User.verify_otp(email, otp):
+    #   Check OTP validity before hashing, but only use it up once the hash is done:
+    #   a request shed with 503 must be retryable with the same OTP
+    if not User.check_otp(email, otp):
         return jsonify({'message': 'Invalid or expired OTP'}), 400
 
-    user = User.get_by_email(email)
+    user = User.get_by_email(email, {'_id': 1})
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
-    #   Hash and update password
-    hashed_password = generate_password_hash(new_password)
-    User.update(user['_id'], {'password': hashed_password})
+    try:
+        password_hash = hash_password(new_password)
+    except HashingOverloaded:
+        return overloaded()
+
+    if not User.verify_otp(email, otp):  # Redeemed by a concurrent request meanwhile
+        return jsonify({'message': 'Invalid or expired OTP'}), 400
+    User.set_password_hash(user['_id'], password_hash)
 
     return jsonify({'message': 'Password updated successfully'}), 200
 
@@ -0,0 +1,139 @@
+import time
+from flask import Blueprint, Response, g, request, jsonify, stream_with_context, url_for
+from werkzeug.utils import secure_filename
+from models.job_models import Job, JobLimitReached, job_public
+from utils.auth import require_auth
+from utils.job_worker import notify_job_queued
+from utils.ocr_utils import preprocess_image
+from utils.sse import KEEPALIVE, SSE_HEADERS, sse
+from config import Config
+
+job_routes = Blueprint('job_routes', __name__)
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def submit(kind, files, params=None):
+    """Preprocess the uploads, queue the job and answer 202 with where to follow it."""
+    pages = [preprocess_image(file.stream) for file in files]
+    try:
+        job_id = Job.create(g.user_id, kind, pages, params)
+    except JobLimitReached:
+        response = jsonify({
+            "error": "Too many jobs in progress",
+            "message": f"At most {Config.JOB_MAX_ACTIVE_PER_USER} jobs can run at once, wait for one to finish"
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    notify_job_queued()
+
+    status_url = url_for('job_routes.get_job', job_id=str(job_id))
+    response = jsonify({
+        "job_id": str(job_id),
+        "status": "queued",
+        "status_url": status_url,
+        "events_url": url_for('job_routes.job_events', job_id=str(job_id))
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+
+@job_routes.route('/jobs/extract-medicines', methods=['POST'])
+@require_auth()
+def submit_extract_medicines():
+    """Asynchronous /extract_medicines: same `image` upload, the job result has the same body."""
+    try:
+        file = request.files.get('image')
+        if not file or file.filename == '':
+            return jsonify({"error": "No image file provided"}), 400
+        if not allowed_file(file.filename):
+            return jsonify({"error": "Invalid file type. Allowed types: jpg, jpeg, png"}), 400
+
+        return submit("prescription", [file])
+
+    except Exception as e:
+        return jsonify({"error": "An error occurred", "message": str(e)}), 500
+
+
+@job_routes.route('/jobs/upload-reports', methods=['POST'])
+@require_auth()
+def submit_upload_reports():
+    """
+    Asynchronous /upload-reports/batch: pages as repeated `images` fields (a single `image`
+    is accepted too), `save=true` stores the report when the job finishes.
+    """
+    try:
+        files = request.files.getlist('images') or request.files.getlist('image')
+        if not files:
+            return jsonify({"error": "No image files provided"}), 400
+        if len(files) > Config.REPORT_MAX_PAGES:
+            return jsonify({"error": f"At most {Config.REPORT_MAX_PAGES} pages per report"}), 400
+        for file in files:
+            if file.filename == '' or not allowed_file(file.filename):
+                return jsonify({"error": "Invalid file type. Allowed types: jpg, jpeg, png"}), 400
+
+        params = {
+            "save": request.form.get('save', 'false').lower() == 'true',
+            "files": [secure_filename(file.filename) for file in files]
+        }
+        return submit("report", files, params)
+
+    except Exception as e:
+        return jsonify({"error": "An error occurred", "message": str(e)}), 500
+
+
+@job_routes.route('/jobs/<job_id>', methods=['GET'])
+@require_auth()
+def get_job(job_id):
+    """Poll a job: status, progress and, once done, its result (kept for JOB_RESULT_TTL seconds)."""
+    job = Job.get(job_id, g.user_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_public(job)), 200
+
+
+@job_routes.route('/jobs/<job_id>/events', methods=['GET'])
+@require_auth()
+def job_events(job_id):
+    """
+    Server-sent events for a job: `progress` whenever its status or progress changes, then
+    one `done` or `failed` event carrying the same body as GET /jobs/<id>. The stream closes
+    after JOB_EVENTS_TIMEOUT seconds; clients reconnect (or poll) to keep following the job.
+    """
+    user_id = g.user_id
+    job = Job.get(job_id, user_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate(job):
+        deadline = time.monotonic() + Config.JOB_EVENTS_TIMEOUT
+        last_state = None
+        last_sent = time.monotonic()
+        while True:
+            public = job_public(job)
+            if public["status"] in ("done", "failed"):
+                yield sse(public["status"], public)
+                return
+            state = (public["status"], public["progress"])
+            if state != last_state:
+                yield sse("progress", public)
+                last_state, last_sent = state, time.monotonic()
+            elif time.monotonic() - last_sent >= Config.JOB_EVENTS_KEEPALIVE:
+                yield KEEPALIVE
+                last_sent = time.monotonic()
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(Config.JOB_EVENTS_POLL_INTERVAL)
+            job = Job.get(job_id, user_id)
+            if not job:  # Expired meanwhile
+                return
+
+    return Response(
+        stream_with_context(generate(job)),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
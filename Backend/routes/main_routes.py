@@ -1,67 +1,122 @@
-import requests
 import re
-from flask import Blueprint, request, jsonify, url_for
-from bson import ObjectId
-from models.user_models import User  
-from utils.token_utils import verify_token 
+from flask import Blueprint, Response, g, request, jsonify, stream_with_context, url_for
+from models.medicine_models import Medicine
+from models.pagination import parse_page_args, next_cursor
+from utils.auth import require_auth
+from utils.label_store import LabelStore, normalize_key
+from utils.suggest_index import SuggestIndex
+from utils.cache import UpstreamCache, hash_key
+from utils.answer_index import SimilarQueryIndex, normalize_query
+from utils.http_client import get_session, timeout_for, upstream_pool
+from utils.drug_images import lookup_drug_image
+from utils.ocr_utils import OcrOutputError, extract_prescription, prescription_response, preprocess_image
+from utils.sse import SSE_HEADERS, sse
+from utils import metrics
+from config import Config
 import google.generativeai as genai
-from werkzeug.utils import secure_filename
-from PIL import Image
-import io
-import os
-import re
+import json
+import requests
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 # API URLs
 OPENFDA_URL = "https://api.fda.gov/drug/label.json"
-SERPAPI_KEY = ""
 API_KEY = ""
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 genai.configure(api_key=API_KEY)
+label_store = LabelStore(Config.LABEL_STORE_PATH)
+suggest_index = SuggestIndex(label_store.iter_names, label_store.version)  # Built on first use, rebuilt after an ingest
+openfda_cache = UpstreamCache("openfda", Config.CACHE_TTLS["openfda"])
+serpapi_cache = UpstreamCache("serpapi", Config.CACHE_TTLS["serpapi"])
+ibm_cache = UpstreamCache("ibm", Config.CACHE_TTLS["ibm"])
+similar_questions = SimilarQueryIndex(
+    Config.ANSWER_INDEX_MAX_ENTRIES, Config.CACHE_TTLS["ibm"], Config.ANSWER_SIMILARITY_THRESHOLD
+) if Config.ANSWER_NEAR_DUPLICATES else None
 
 main_routes = Blueprint('main_routes', __name__)
-# Function to fetch the first image from Google search
-def fetch_first_image(drug_name):
-    url = "https://serpapi.com/search"
-    params = {
-        "q": drug_name,
-        "tbm": "isch",  # Image search
-        "api_key": SERPAPI_KEY
-    }
-
-    response = requests.get(url, params=params)
-    data = response.json()
 
-    # Get the first image URL
-    if "images_results" in data and data["images_results"]:
-        return data["images_results"][0]["original"]
-    return None
+def fetch_first_image(drug_name):
+    """Cached wrapper around the image catalog / SerpAPI image search."""
+    return serpapi_cache.get_or_fetch(normalize_key(drug_name), lambda: lookup_drug_image(drug_name))
+
+_pending_images = {}
+_pending_images_lock = threading.Lock()
+
+def submit_image_lookup(drug_name):
+    """Start (or join) a background image lookup for `drug_name` and return its future."""
+    key = normalize_key(drug_name)
+    with _pending_images_lock:
+        future = _pending_images.get(key)
+        if future is not None:
+            return future
+        future = upstream_pool.submit(fetch_first_image, drug_name)
+        _pending_images[key] = future
+
+    def _done(done_future):
+        with _pending_images_lock:
+            if _pending_images.get(key) is done_future:
+                del _pending_images[key]
+
+    # Registered outside the lock: the callback runs right away if the lookup already finished
+    future.add_done_callback(_done)
+    return future
 
 def extract_mg_value(text):
     """Extracts the mg (milligram) value from a string."""
     match = re.search(r'(\d+\s?mg)', text)  # Looks for 'number + mg'
     return match.group(1) if match else "N/A"
 
+def request_label_from_openfda(medicine_name):
+    """Query OpenFDA for the best matching label. Returns None when nothing matches."""
+    api_url = f"{OPENFDA_URL}?search=active_ingredient:{medicine_name}&limit=1"
+    print(f"Fetching data from: {api_url}")
+
+    response = get_session("openfda").get(api_url, timeout=timeout_for("openfda"))
+    data = response.json()
+
+    if "results" not in data or not data["results"]:
+        return None
+    return data["results"][0]
+
+def fetch_label_from_openfda(medicine_name):
+    return openfda_cache.get_or_fetch(
+        hash_key("label", normalize_key(medicine_name)), lambda: request_label_from_openfda(medicine_name)
+    )
+
+def lookup_label(medicine_name):
+    """Serve a label from the local index, going to OpenFDA only on a miss (if enabled)."""
+    medicine_info = label_store.lookup(medicine_name)
+    if medicine_info is None and Config.OPENFDA_FALLBACK:
+        medicine_info = fetch_label_from_openfda(medicine_name)
+    return medicine_info
+
 # Medicine info endpoint (now includes image)
 @main_routes.route('/medicine/<string:medicine_name>', methods=['GET'])
 def get_medicine_info(medicine_name):
     try:
-        # Fetch medicine data from OpenFDA
-        api_url = f"{OPENFDA_URL}?search=active_ingredient:{medicine_name}&limit=1"
-        print(f"Fetching data from: {api_url}")
+        medicine_info = lookup_label(medicine_name)
 
-        response = requests.get(api_url)
-        data = response.json()
-        print("API Response:", data)  # Debugging print
-
-        if "results" not in data or not data["results"]:
+        if not medicine_info:
             return jsonify({"error": "Medicine not found", "message": "Try another brand name"}), 404
 
-        medicine_info = data["results"][0]
-         # Build response
-        mg_value = extract_mg_value(medicine_info["active_ingredient"][0])
+        # Only a known medicine is worth a (paid) image search; it runs while the response is built
+        image_future = submit_image_lookup(medicine_name)
 
-        # Fetch image URL
-        image_url = fetch_first_image(medicine_name)
+         # Build response
+        mg_value = extract_mg_value(medicine_info.get("active_ingredient", ["N/A"])[0])
+
+        # Use the image if it arrives within the grace period, otherwise point at the follow-up endpoint
+        try:
+            image_url = image_future.result(timeout=Config.MEDICINE_IMAGE_GRACE)
+            image_pending = False
+        except FutureTimeoutError:
+            image_url = None
+            image_pending = True
+        except Exception as e:
+            print(f"Image lookup failed: {e}")
+            image_url = None
+            image_pending = False
 
        
         result = {
@@ -73,14 +128,53 @@ def get_medicine_info(medicine_name):
             "do_not_use": medicine_info.get("do_not_use", ["N/A"])[0],
             "when_using": medicine_info.get("when_using", ["N/A"])[0],
             "dosage_and_administration": medicine_info.get("dosage_and_administration", ["N/A"])[0],
-            "image_url": image_url if image_url else "No image available"
+            "image_url": image_url if image_url else "No image available",
+            "image_pending": image_pending
         }
+        if image_pending:
+            result["image_url_endpoint"] = url_for("main_routes.get_medicine_image", medicine_name=medicine_name)
 
         return jsonify(result)
 
+    except requests.exceptions.Timeout:
+        return jsonify({"error": "Upstream timeout", "message": "Medicine lookup took too long, try again"}), 504
+    except Exception as e:
+        return jsonify({"error": "An error occurred", "message": str(e)}), 500
+
+@main_routes.route('/medicine/<string:medicine_name>/image', methods=['GET'])
+def get_medicine_image(medicine_name):
+    """Follow-up for /medicine/<name> responses that returned before the image was ready."""
+    try:
+        image_url = submit_image_lookup(medicine_name).result(
+            timeout=Config.UPSTREAM_CONNECT_TIMEOUT + Config.UPSTREAM_TIMEOUTS["serpapi"]
+        )
+        return jsonify({"image_url": image_url if image_url else "No image available"}), 200
+
+    except FutureTimeoutError:
+        return jsonify({"error": "Upstream timeout", "message": "Image lookup took too long, try again"}), 504
     except Exception as e:
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
 
+def request_suggestions_from_openfda(query):
+    """Legacy suggestion path: filter brand names out of an OpenFDA wildcard search."""
+    api_url = f"{OPENFDA_URL}?search=active_ingredient:{query}*&limit=100"
+    print(f"Fetching data from: {api_url}")
+
+    response = get_session("openfda").get(api_url, timeout=timeout_for("openfda"))
+    data = response.json()
+
+    suggestions = []
+    for medicine_info in data.get("results", []):
+        brand_name = medicine_info.get("openfda", {}).get("brand_name", ["N/A"])[0]
+        if brand_name.lower().startswith(query):  # Filter only those that start with the query
+            suggestions.append(brand_name)
+    return suggestions or None  # None is cached as a (short-lived) miss
+
+def fetch_suggestions_from_openfda(query):
+    return openfda_cache.get_or_fetch(
+        hash_key("suggestions", query), lambda: request_suggestions_from_openfda(query)
+    ) or []
+
 # Endpoint for suggesting medicine names while typing
 @main_routes.route('/medicine_suggestions', methods=['GET'])
 def suggest_medicine_names():
@@ -88,21 +182,14 @@ def suggest_medicine_names():
         query = request.args.get('query', '').lower()
         if not query or len(query) < 3:
             return jsonify([]) 
-        api_url = f"{OPENFDA_URL}?search=active_ingredient:{query}*&limit=100"
-        print(f"Fetching data from: {api_url}")
-
-        response = requests.get(api_url)
-        data = response.json()
-        print("API Response:", data)  # Debugging print
+        limit = max(1, min(request.args.get('limit', Config.SUGGESTION_LIMIT, type=int), Config.SUGGESTION_MAX_LIMIT))
 
-        if "results" not in data or not data["results"]:
-            return jsonify({"error": "No suggestions found", "message": "No medicines match your query"}), 404
-
-        suggestions = []
-        for medicine_info in data["results"]:
-            brand_name = medicine_info.get("openfda", {}).get("brand_name", ["N/A"])[0]
-            if brand_name.lower().startswith(query):  # Filter only those that start with the query
-                suggestions.append(brand_name)
+        if len(suggest_index):
+            suggestions = suggest_index.complete(query, limit)
+        elif Config.OPENFDA_FALLBACK:
+            suggestions = fetch_suggestions_from_openfda(query)[:limit]
+        else:
+            suggestions = []
 
         if not suggestions:
             return jsonify({"error": "No suggestions found", "message": "No medicines found that match your query"}), 404
@@ -111,27 +198,12 @@ def suggest_medicine_names():
 
     except Exception as e:
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
-# Function to extract user_id from token
-def get_user_id_from_token():
-    token = request.headers.get("Authorization")
-    if not token:
-        print("No token")
-        return None
-
-    try:
-        token = token.split(" ")[1]  # Remove "Bearer "
-        decoded_token = verify_token(token)  # Decode JWT
-        print(decoded_token)
-        return decoded_token
-    except Exception:
-        return None
 
 @main_routes.route('/save_medicine', methods=['POST'])
+@require_auth(projection="role")  # Also checks that the user still exists
 def save_medicine():
     try:
-        user_id = get_user_id_from_token()
-        if not user_id:
-            return jsonify({"error": "Unauthorized", "message": "Invalid or missing token"}), 401
+        user_id = g.user_id
 
         data = request.get_json()
         medicine_details = data.get("medicine_details")
@@ -139,16 +211,7 @@ def save_medicine():
         if not medicine_details:
             return jsonify({"error": "Missing medicine details"}), 400
 
-        # Check if user exists
-        user = User.get_by_id(user_id)
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-
-        # Use `$push` instead of `$set` to add to the array
-        result = User.update(user_id, {"$push": {"saved_medicines": medicine_details}})
-
-        if result.modified_count == 0:
-            return jsonify({"message": "No changes made, medicine might already exist"}), 200
+        Medicine.save_medicine(user_id, medicine_details)
 
         return jsonify({"message": "Medicine saved successfully"}), 200
 
@@ -156,22 +219,19 @@ def save_medicine():
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
 
 @main_routes.route('/get_saved_medicines', methods=['GET'])
+@require_auth(projection="role")  # Also checks that the user still exists
 def get_saved_medicines():
     try:
-        user_id = get_user_id_from_token()
-        if not user_id:
-            return jsonify({"error": "Unauthorized", "message": "Invalid or missing token"}), 401
-
-        # Fetch user details from the database
-        user = User.get_by_id(user_id)
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        user_id = g.user_id
 
-        # Get the saved medicines list (default to empty array if not found)
-        saved_medicines = user.get("saved_medicines", [])
+        # One page of saved medicines (?limit=&after=<next_cursor>)
+        limit, after = parse_page_args(request.args)
+        saved_medicines = Medicine.get_saved_medicines(user_id, limit, after)
 
-        return jsonify({"medicines": saved_medicines}), 200
+        return jsonify({"medicines": saved_medicines, "next_cursor": next_cursor(saved_medicines, limit)}), 200
 
+    except ValueError as e:
+        return jsonify({"error": "Invalid pagination parameters", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
 
@@ -191,38 +251,16 @@ def extract_medicines():
         if not allowed_file(file.filename):
             return jsonify({"error": "Invalid file type. Allowed types: jpg, jpeg, png"}), 400
 
-        filename = secure_filename(file.filename)
-        image = Image.open(file.stream).convert("RGB")
+        # Downscaled upload; the same picture gives the same digest, so re-scans hit the OCR cache
+        image_bytes, digest = preprocess_image(file.stream)
 
-        # Convert image to bytes for Gemini API
-        with io.BytesIO() as output:
-            image.save(output, format="JPEG")
-            image_bytes = output.getvalue()
+        # One Gemini call returns the text and the structured medicine list
+        result = extract_prescription(image_bytes, digest)
 
-        # Use Gemini API for OCR
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content([
-            {"parts": [{"text": "Extract only the medicine names from this image:"},
-                        {"inline_data": {"mime_type": "image/jpeg", "data": image_bytes}}]}
-        ])
-
-        recognized_text = response.text if response else "No text recognized"
-
-        # Send extracted text back to Gemini for medicine name extraction
-        refined_response = model.generate_content([
-            {"parts": [{"text": f"From the following text, extract only the medicine names and return them as a comma-separated list:\n\n{recognized_text}"}]}
-        ])
-
-        extracted_medicines = refined_response.text.strip() if refined_response else "No medicines found"
-
-        # Convert extracted medicines into the required format (list of lists)
-        medicine_list = [[med.strip()] for med in extracted_medicines.split(",")]
-
-        return jsonify({
-            "recognized_text": recognized_text,
-            "medicines": medicine_list
-        }), 200
+        return jsonify(prescription_response(result)), 200
 
+    except OcrOutputError as e:
+        return jsonify({"error": "Could not read the prescription", "message": str(e)}), 502
     except Exception as e:
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
 
@@ -230,12 +268,12 @@ def extract_medicines():
 
 # IBM Watson Granite API Details
 IBM_URL = "https://eu-de.ml.cloud.ibm.com/ml/v1/text/generation?version=2023-05-29"
+IBM_STREAM_URL = "https://eu-de.ml.cloud.ibm.com/ml/v1/text/generation_stream?version=2023-05-29"
 IBM_MODEL_ID = "ibm/granite-3-8b-instruct"
 IBM_PROJECT_ID = "c6bde235-19d3-4773-8ab4-f226d36f509e"
 IBM_AUTH_TOKEN = "eyJraWQiOiIyMDI1MDEzMDA4NDQiLCJhbGciOiJSUzI1NiJ9.eyJpYW1faWQiOiJJQk1pZC02QTcwMDA0RFpNIiwiaWQiOiJJQk1pZC02QTcwMDA0RFpNIiwicmVhbG1pZCI6IklCTWlkIiwianRpIjoiMjMyY2EwNmQtN2M1Yi00ODBiLWFmNDEtODFjNjFiZDI3MjI1IiwiaWRlbnRpZmllciI6IjZBNzAwMDREWk0iLCJnaXZlbl9uYW1lIjoiU2FtYXJ0aCIsImZhbWlseV9uYW1lIjoiQmhpbWFuaSIsIm5hbWUiOiJTYW1hcnRoIEJoaW1hbmkiLCJlbWFpbCI6InNhbWFydGhiaGltYW5pMTFAZ21haWwuY29tIiwic3ViIjoic2FtYXJ0aGJoaW1hbmkxMUBnbWFpbC5jb20iLCJhdXRobiI6eyJzdWIiOiJzYW1hcnRoYmhpbWFuaTExQGdtYWlsLmNvbSIsImlhbV9pZCI6IklCTWlkLTZBNzAwMDREWk0iLCJuYW1lIjoiU2FtYXJ0aCBCaGltYW5pIiwiZ2l2ZW5fbmFtZSI6IlNhbWFydGgiLCJmYW1pbHlfbmFtZSI6IkJoaW1hbmkiLCJlbWFpbCI6InNhbWFydGhiaGltYW5pMTFAZ21haWwuY29tIn0sImFjY291bnQiOnsidmFsaWQiOnRydWUsImJzcyI6ImQ0ZDJkOWQ4ZTcyNDRiYmRiNzc5MDM5ZWJjNDRjMzY3IiwiaW1zX3VzZXJfaWQiOiIxMzI2NjQ5NCIsImZyb3plbiI6dHJ1ZSwiaW1zIjoiMzAxMTYwMiJ9LCJpYXQiOjE3Mzk2MDc2NzksImV4cCI6MTczOTYxMTI3OSwiaXNzIjoiaHR0cHM6Ly9pYW0uY2xvdWQuaWJtLmNvbS9pZGVudGl0eSIsImdyYW50X3R5cGUiOiJ1cm46aWJtOnBhcmFtczpvYXV0aDpncmFudC10eXBlOmFwaWtleSIsInNjb3BlIjoiaWJtIG9wZW5pZCIsImNsaWVudF9pZCI6ImRlZmF1bHQiLCJhY3IiOjEsImFtciI6WyJwd2QiXX0.Yh0lGHk7FNOnNR9PBdJ3wbq_1APgu-qEtNPWZWevk0IdYyOBNNrUxpIOWrONnAh3rFWLsFCtsI6rj8JpY1TZ8TsN82260wxiQHhHYhI5XwkVS6BwvjJJVOzrO0MSOnDseOvVsMpx1vv4k5uCKMML9UWdXQuZx6Volz2sk1GUNGhCuGRv-8Js_4Q6bPL5kp40CkR1_-Um6KwJVMxihOpkAddDROySlUiF1erTdWrpkC30kOq363R6_QTp7tG3JuEdsCuS-UDaZLkIKlEEWu1abqigpm9e2VFLa2Z0oB2nP6tSxk3q5ZIG8DVDsOndf2TjQaPKa8OlAvoBFPBec-Ub3w"
-# Function to query IBM Watson API
-def get_ai_response(user_input):
-    body = {
+def granite_body(user_input):
+    return {
         "input": f"""<|start_of_role|>system<|end_of_role|>You are Granite, an AI language model developed by IBM in 2024. You are a cautious assistant. You carefully follow instructions. You are helpful and harmless and you follow ethical guidelines and promote positive behavior.<|end_of_text|>
         <|start_of_role|>user<|end_of_role|>{user_input}<|end_of_text|>
         <|start_of_role|>assistant<|end_of_role|>""",
@@ -249,28 +287,151 @@ def get_ai_response(user_input):
         "project_id": IBM_PROJECT_ID
     }
 
-    headers = {
-        "Accept": "application/json",
+def ibm_headers(accept):
+    return {
+        "Accept": accept,
         "Content-Type": "application/json",
         "Authorization": f"Bearer {IBM_AUTH_TOKEN}"
     }
 
-    response = requests.post(IBM_URL, headers=headers, json=body)
+# Function to query IBM Watson API
+def request_ai_response(user_input):
+    response = get_session("ibm").post(
+        IBM_URL, headers=ibm_headers("application/json"), json=granite_body(user_input), timeout=timeout_for("ibm")
+    )
 
     if response.status_code != 200:
         return {"error": f"API Error: {response.text}"}
 
     return response.json()
 
+def stream_ai_response(user_input):
+    """
+    Yield the generated text piece by piece from the streaming endpoint, over the same
+    pooled session. Raises RuntimeError on an API error.
+    """
+    response = get_session("ibm").post(
+        IBM_STREAM_URL, headers=ibm_headers("text/event-stream"), json=granite_body(user_input),
+        timeout=timeout_for("ibm"), stream=True
+    )
+    with response:  # Hands the connection back to the pool, also when the client goes away mid-stream
+        if response.status_code != 200:
+            raise RuntimeError(f"API Error: {response.text}")
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = json.loads(line[len("data:"):])
+            if payload.get("errors"):
+                raise RuntimeError(f"API Error: {payload['errors']}")
+            for result in payload.get("results", []):
+                if result.get("generated_text"):
+                    yield result["generated_text"]
+
+def ai_response_text(result):
+    return result.get("results", [{}])[0].get("generated_text", "No response found.")
+
+def has_answer(result):
+    """True for a model result worth caching: no error and some generated text."""
+    return "error" not in result and bool(result.get("results", [{}])[0].get("generated_text", "").strip())
+
+def answer_key(user_input):
+    """Cache key of a question: questions differing only in case, spacing or trailing punctuation share it."""
+    return hash_key(IBM_MODEL_ID, normalize_query(user_input) or user_input)
+
+def similar_answer(user_input):
+    """Cached answer to an earlier, near-identical question (ANSWER_NEAR_DUPLICATES), or None."""
+    if similar_questions is None:
+        return None
+    key = similar_questions.find(user_input)
+    if key is None:
+        return None
+    cached = ibm_cache.peek(key)
+    if cached is None:  # Evicted from the answer cache meanwhile
+        similar_questions.discard(key)
+        return None
+    metrics.incr("cache.ibm.near_duplicate_hits")
+    return cached
+
+def remember_question(key, user_input):
+    if similar_questions is not None:
+        similar_questions.add(key, user_input)
+
+def get_ai_response(user_input):
+    """
+    Cached Granite generation. Decoding is greedy, so identical prompts give identical answers.
+    On a miss, the answer to a near-duplicate question is reused before calling the model.
+    """
+    key = answer_key(user_input)
+
+    def fetch():
+        result = similar_answer(user_input)
+        if result is None:
+            result = request_ai_response(user_input)
+            if has_answer(result):
+                remember_question(key, user_input)
+        return result
+
+    return ibm_cache.get_or_fetch(key, fetch, cacheable=has_answer)
+
+def ai_response_events(user_input):
+    """
+    Server-sent events for an answer: `token` events as text is generated, then `done` with
+    the whole answer (or `error`). A cached answer is sent at once; a completed stream is
+    cached like a non-streamed answer, unless the model returned no text (then `error`).
+    """
+    key = answer_key(user_input)
+    cached = ibm_cache.peek(key) or similar_answer(user_input)
+    if cached is not None:
+        text = ai_response_text(cached)
+        yield sse("token", {"text": text})
+        yield sse("done", {"text": text})
+        return
+
+    started = time.perf_counter()
+    chunks = []
+    try:
+        for chunk in stream_ai_response(user_input):
+            if not chunks:
+                metrics.observe("ibm.first_token_seconds", time.perf_counter() - started)
+            chunks.append(chunk)
+            yield sse("token", {"text": chunk})
+    except Exception as e:
+        print(f"AI response stream failed: {e}")
+        yield sse("error", {"error": "An error occurred", "message": str(e)})
+        return
+
+    metrics.observe("ibm.stream_seconds", time.perf_counter() - started)
+    result = {"results": [{"generated_text": "".join(chunks)}]}
+    if not has_answer(result):
+        metrics.incr("ibm.empty_answers")
+        yield sse("error", {"error": "No response found", "message": "The model returned an empty answer, try again"})
+        return
+    ibm_cache.put(key, result)
+    remember_question(key, user_input)
+    yield sse("done", {"text": ai_response_text(result)})
+
 # Flask API Route
 @main_routes.route('/ask-ai', methods=['POST'])
 def ask_ai():
+    """
+    Answers with the whole reply as a JSON string. With `"stream": true` in the body (or
+    `Accept: text/event-stream`) the reply is streamed as server-sent events instead, see
+    ai_response_events().
+    """
     data = request.get_json()
     user_input = data.get("query")
 
     if not user_input:
         return jsonify({"error": "Missing 'query' parameter"}), 400
-    
-    print(get_ai_response(user_input))
-    ai_response = get_ai_response(user_input).get("results", [{}])[0].get("generated_text", "No response found.")
+
+    wants_stream = request.accept_mimetypes.best_match(["application/json", "text/event-stream"]) == "text/event-stream"
+    if data.get("stream") or wants_stream:
+        return Response(stream_with_context(ai_response_events(user_input)), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+    ai_response = ai_response_text(get_ai_response(user_input))
     return jsonify(ai_response)
+
+@main_routes.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Process-local counters (cache hits/misses etc.)."""
+    return jsonify(metrics.snapshot()), 200
@@ -1,19 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, g, request, jsonify, stream_with_context
 from models.user_models import User
-import threading
-import time
-import schedule
-import jwt
+from models.medicine_models import Medicine
+from models.user_loader import load_users
+from models.reminder_models import Reminder
+from models.pagination import parse_page_args, next_cursor
+from utils.reminder_scheduler import reminder_dispatcher
 from config import Config
 import pytz
-from utils.token_utils import verify_token
-from firebase_admin import credentials, messaging, initialize_app
+from utils.auth import require_auth
+from utils.ocr_utils import process_report_pages
+from firebase_admin import credentials, initialize_app
 from werkzeug.utils import secure_filename  #   Import this at the top
 import os
 import google.generativeai as genai
-from PIL import Image
-import io
-from bson.regex import Regex
+from bson import ObjectId
 from datetime import datetime
 
 # Initialize Firebase Admin SDK
@@ -25,31 +25,12 @@ UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 API_KEY = ""
 genai.configure(api_key=API_KEY)
-def decode_token(token):
-    """Extract user_id from token"""
-    token = request.headers.get("Authorization")
-    if not token:
-        print("No token found")
-        return None
-
-    try:
-        token = token.split(" ")[1]  # Remove "Bearer "
-        decoded_token = verify_token(token)  # Decode JWT
-        print(decoded_token)
-        return decoded_token
-    except Exception as e:
-        print(f"Token decoding error: {e}")
-        return None
-
 # 🔹 Save FCM Token API
 @medicine_bp.route("/save_fcm_token", methods=["POST"])
+@require_auth()
 def save_fcm_token():
     """Save the user's FCM token for push notifications."""
-    token = request.headers.get("Authorization")  # Fetch user token
-    user_id = decode_token(token)  # Decode user token
-
-    if not user_id:
-        return jsonify({"error": "Invalid or expired token"}), 401
+    user_id = g.user_id
 
     data = request.json
     fcm_token = data.get("fcm_token")  # Expo Push Token
@@ -64,14 +45,11 @@ def save_fcm_token():
 
 # 🔹 Add Medicine API
 @medicine_bp.route("/add_medicine", methods=["POST"])
+@require_auth()
 def add_medicine():
     """Add medicine details to a user's saved and current medicines"""
     data = request.json  
-    token = request.headers.get("Authorization")  
-    user_id = decode_token(token)  
-
-    if not user_id:
-        return jsonify({"error": "Invalid or expired token"}), 401
+    user_id = g.user_id
 
     # Extract values
     name = data.get("name")
@@ -93,83 +71,30 @@ def add_medicine():
 
     medicine = {
         "name": name,
-        "consulting_date": datetime.datetime.strptime(consulting_date, "%Y-%m-%d"),
+        "consulting_date": datetime.strptime(consulting_date, "%Y-%m-%d"),
         "dosage_period": dosage_period,
         "num_medicines": num_medicines,
         "interval": interval,
         "times": times,
-        "created_at": datetime.datetime.now(pytz.utc),
+        "created_at": datetime.now(pytz.utc),
     }
 
-    User.update(user_id, {"$push": {"current_medicines": medicine}})
+    medicine = Medicine.add_current_medicine(user_id, medicine)
+    reminder_dispatcher.notify(Reminder.add_for_medicine(user_id, medicine))
 
     return jsonify({"message": "Medicine added successfully", "medicine": medicine}), 201
 
-# 🔹 Send Notification Function
-def send_notification(user_fcm_token, medicine_name, time):
-    """Send a push notification via Firebase Cloud Messaging (FCM)"""
-    
-    if not user_fcm_token:
-        print("No FCM token available for the user.")
-        return False
-
-    message = messaging.Message(
-        notification=messaging.Notification(
-            title="Medicine Reminder 💊",
-            body=f"Take {medicine_name} at {time}."
-        ),
-        token=user_fcm_token
-    )
-
-    try:
-        response = messaging.send(message)
-        print(f"Notification sent successfully: {response}")
-        return True
-    except Exception as e:
-        print(f"Error sending notification: {e}")
-        return False
-
-# 🔹 Schedule Medicine Reminders
-def schedule_medicine_reminders():
-    """Schedule medicine reminders for all users"""
-    users = User.get_all_users()
-    for user in users:
-        user_fcm_token = user.get("fcm_token")
-        
-        for medicine in user.get("current_medicines", []):  
-            for time in medicine["times"]:
-                schedule.every().day.at(time).do(send_notification, user_fcm_token, medicine["name"], time)
-
-# 🔹 Start Scheduler in Background
-def start_reminder_scheduler():
-    """Run the scheduler to check medicine reminders."""
-    schedule_medicine_reminders()
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
-
-threading.Thread(target=start_reminder_scheduler, daemon=True).start()
-
 @medicine_bp.route("/get_user_details", methods=["GET"])
+@require_auth(projection="profile")
 def get_user_details():
     """Fetch all details of the authenticated user."""
-    token = request.headers.get("Authorization")
-    user_id = decode_token(token)
-    
-    if not user_id:
-        return jsonify({"error": "Invalid or expired token"}), 401
-
-    # Fetch user data from MongoDB
-    user = User.get_by_id(user_id)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
-
-    # Remove sensitive information before sending the response
-    user.pop("password", None)
+    # Related entries (first page of each) without sensitive information
+    user = User.with_related(g.user, Config.PAGE_SIZE)
 
     return jsonify({"user": user}), 200
 
 @medicine_bp.route("/save_medicine", methods=["POST"])
+@require_auth()
 def save_medicine():
     """
     Save medicine details to a user's saved_medicines using token authentication.
@@ -190,10 +115,7 @@ def save_medicine():
     }
     """
     data = request.json
-    token = request.headers.get("Authorization")
-    user_id = decode_token(token)
-    if not user_id:
-        return jsonify({"error": "Invalid or expired token"}), 401
+    user_id = g.user_id
 
     medicine_details = data.get("medicine_details")
     if not medicine_details:
@@ -201,9 +123,8 @@ def save_medicine():
 
     # Optionally, add more validation for required fields inside medicine_details here
 
-    # Save the medicine details into the user's saved_medicines array.
-    update_data = {"$push": {"saved_medicines": medicine_details}}
-    User.update(user_id, update_data)
+    # Save the medicine details into the user's saved medicines.
+    Medicine.save_medicine(user_id, medicine_details)
 
     return jsonify({"message": "Medicine saved successfully", "medicine": medicine_details}), 201
 
@@ -215,8 +136,11 @@ def search_doctor():
     if not name_query:
         return jsonify({'message': 'Please provide a name to search'}), 400
 
-    #   Find doctors by name and return their user_id (doctor_id)
-    doctors = User.find_by_role_and_name('doctor', name_query)
+    limit = request.args.get('limit', Config.DOCTOR_SEARCH_LIMIT, type=int) or Config.DOCTOR_SEARCH_LIMIT
+    limit = max(1, min(limit, Config.DOCTOR_SEARCH_MAX_LIMIT))
+
+    #   Find doctors by name and return their user_id (doctor_id), best matches first
+    doctors = User.find_by_role_and_name('doctor', name_query, limit)
 
     if not doctors:
         return jsonify({'message': 'No doctors found'}), 404
@@ -227,61 +151,39 @@ def search_doctor():
 
 
 @medicine_bp.route('/request-access', methods=['POST'])
+@require_auth()
 def request_access():
-    token = request.headers.get("Authorization")  # Fetch user token
-    user_id = decode_token(token)  #   Extract patient_id from token
+    user_id = g.user_id  #   The patient asking for access
     data = request.get_json()
 
-    if not user_id or "doctor_id" not in data:
+    if "doctor_id" not in data:
         return jsonify({"message": "Missing user data"}), 400
 
     doctor_id = data["doctor_id"]
 
-    #   Check if `access_requests` exists and is an array
-    doctor = User.get_by_id(doctor_id)
+    doctor = User.get_by_id(doctor_id, "role")
     if not doctor:
         return jsonify({"message": "Doctor not found"}), 404
 
-    if "access_requests" not in doctor or not isinstance(doctor["access_requests"], list):
-        #   Convert to array if it's missing or of incorrect type
-        User.update(doctor_id, {"$set": {"access_requests": []}})
-
-    #   Store request in User model
-    request_entry = {
-        "patient_id": user_id,
-        "doctor_id": doctor_id,
-        "requested_at": datetime.utcnow().replace(tzinfo=pytz.utc)
-    }
-
-    #   Now safely push the request
-    update_result = User.update(doctor_id, {"$push": {"access_requests": request_entry}})
-
-    if update_result.modified_count == 0:
-        return jsonify({"message": "Failed to send request"}), 500
+    #   Store the request (one pending request per doctor/patient pair)
+    User.add_access_request(doctor_id, user_id)
 
     return jsonify({"message": "Access request sent successfully"}), 200
 
 #   Endpoint: Doctor retrieves patient details
 @medicine_bp.route('/get-patient-details/<patient_id>', methods=['GET'])
+@require_auth(roles=["doctor"])
 def get_patient_details(patient_id):
-    doctor_id = request.args.get('doctor_id')
-
-    if not doctor_id:
-        return jsonify({'message': 'Missing doctor_id'}), 400
-
-    doctor = User.get_by_id(doctor_id)
-
-    if not doctor or doctor.get('role') != 'doctor' or patient_id not in doctor.get('authorized_patients', []):
+    if not ObjectId.is_valid(patient_id) or not User.is_authorized(g.user_id, patient_id):
         return jsonify({'message': 'Access denied'}), 403
 
-    patient = User.get_by_id(patient_id)
+    patient = User.get_by_id(patient_id, "profile")
     
     if not patient:
         return jsonify({'message': 'Patient not found'}), 404
 
-    # Remove sensitive information
-    patient.pop('password', None)
-    patient.pop('otps', None)
+    # Related entries without sensitive information
+    patient = User.with_related(patient, Config.PAGE_SIZE)
 
     return jsonify({'patient_details': patient}), 200
 
@@ -293,15 +195,9 @@ def allowed_file(filename):
 
 
 @medicine_bp.route('/upload-reports', methods=['POST'])
+@require_auth()
 def upload_reports():
     try:
-        #   Verify user authentication
-        token = request.headers.get("Authorization")
-        user_id = decode_token(token)
-        
-        if not user_id:
-            return jsonify({"error": "Unauthorized access"}), 401
-
         #   Check if an image file is uploaded
         if 'image' not in request.files:
             return jsonify({"error": "No image file provided"}), 400
@@ -314,34 +210,8 @@ def upload_reports():
         if not allowed_file(file.filename):
             return jsonify({"error": "Invalid file type. Allowed types: jpg, jpeg, png"}), 400
 
-        #   Convert image to bytes
-        image = Image.open(file.stream).convert("RGB")
-        with io.BytesIO() as output:
-            image.save(output, format="JPEG")
-            image_bytes = output.getvalue()
-
-        #   Step 1: Extract Full Text from Image
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content([
-            {"parts": [
-                {"text": "Extract all the text from this medical report image:"},
-                {"inline_data": {"mime_type": "image/jpeg", "data": image_bytes}}
-            ]}
-        ])
-
-        extracted_text = response.text.strip() if response else "No text recognized"
-
-        #   Step 2: Summarize Extracted Text
-        summary_response = model.generate_content([
-            {"parts": [
-                {"text": f"Summarize the following medical report text:\n\n{extracted_text}"}
-            ]}
-        ])
-
-        summary = summary_response.text.strip() if summary_response else "No summary generated."
-
-        print(f"Extracted Text:\n{extracted_text}\n")
-        print(f"Summary:\n{summary}\n")
+        #   Extract the full text, then summarize it
+        extracted_text, summary = process_report_pages([file.stream])
 
         return jsonify({
             "extracted_text": extracted_text,
@@ -351,15 +221,61 @@ def upload_reports():
     except Exception as e:
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
 
+
+@medicine_bp.route('/upload-reports/batch', methods=['POST'])
+@require_auth()
+def upload_report_batch():
+    """
+    Multi-page variant of /upload-reports: send the pages as repeated `images` fields, in
+    page order. Pages are OCR'd concurrently and summarized together.
+    With form field `save=true` the result is stored straight into the user's reports.
+    """
+    try:
+        files = request.files.getlist('images')
+        if not files:
+            return jsonify({"error": "No image files provided"}), 400
+        if len(files) > Config.REPORT_MAX_PAGES:
+            return jsonify({"error": f"At most {Config.REPORT_MAX_PAGES} pages per report"}), 400
+        for file in files:
+            if file.filename == '' or not allowed_file(file.filename):
+                return jsonify({"error": "Invalid file type. Allowed types: jpg, jpeg, png"}), 400
+
+        extracted_text, summary = process_report_pages([file.stream for file in files])
+        result = {"pages": len(files), "extracted_text": extracted_text, "summary": summary}
+
+        if request.form.get('save', 'false').lower() == 'true':
+            result["report"] = User.save_report(
+                g.user_id, summary,
+                report_files=[secure_filename(file.filename) for file in files],
+                extracted_text=extracted_text
+            )
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({"error": "An error occurred", "message": str(e)}), 500
+
 #   2️⃣ API to Retrieve Saved Reports
 @medicine_bp.route("/get-reports/<user_id>", methods=["GET"])
+@require_auth(projection="role")
 def get_reports(user_id):
-    reports = User.get_reports(user_id)
-    if not reports:
+    """A user's reports, for the user themselves or a doctor they granted access to."""
+    if str(g.user_id) != str(user_id):
+        if g.user.get("role") != "doctor" or not ObjectId.is_valid(user_id) or not User.is_authorized(g.user_id, user_id):
+            return jsonify({"error": "Unauthorized request"}), 403
+
+    try:
+        limit, after = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": "Invalid pagination parameters", "message": str(e)}), 400
+
+    reports = User.get_reports(user_id, limit, after)
+    if not reports and not after:
         return jsonify({"message": "No reports found"}), 404
 
-    return jsonify({"reports": reports}), 200
+    return jsonify({"reports": reports, "next_cursor": next_cursor(reports, limit)}), 200
 @medicine_bp.route('/get-requests/<doctor_id>', methods=['GET'])
+@require_auth(roles=["doctor"])
 def get_requests(doctor_id):
     """
     API for doctors to get pending patient access requests.
@@ -367,45 +283,23 @@ def get_requests(doctor_id):
     - Returns a list of requests with patient details.
     """
     try:
-        #   Get the token from request headers
-        token = request.headers.get("Authorization")
-        if not token or not token.startswith("Bearer "):
-            return jsonify({"error": "Missing or invalid Authorization token"}), 401
-
-        #   Remove "Bearer " prefix and verify token
-        token = token.split(" ")[1]
-        decoded_user_id = verify_token(token)
-
-        if not decoded_user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
-
         #   Ensure the requested doctor ID matches the token user ID
-        if str(decoded_user_id) != str(doctor_id):
+        if str(g.user_id) != str(doctor_id):
             return jsonify({"error": "Unauthorized request"}), 403
 
-        #   Verify if the doctor exists
-        doctor = User.get_by_id(doctor_id)
-        if not doctor or doctor.get("role") != "doctor":
-            return jsonify({"error": "Doctor not found"}), 404
-
         #   Fetch pending access requests
         requests = []
-        access_requests = doctor.get("access_requests", [])
-
-        #   Ensure `access_requests` is a list of dictionaries
-        if not isinstance(access_requests, list):
-            access_requests = []  # Default to an empty list if the format is incorrect
+        access_requests = User.get_access_requests(doctor_id)
+        patients = load_users([entry["patient_id"] for entry in access_requests])
 
         for request_entry in access_requests:
-            if isinstance(request_entry, dict) and "patient_id" in request_entry:  #   Ensure dictionary format
-                patient = User.get_by_id(request_entry["patient_id"])
-                if patient:
-                    requests.append({
-                        "patient_id": str(request_entry["patient_id"]),
-                        "patient_name": patient.get("name", "Unknown"),
-                        "patient_email": patient.get("email", "Unknown"),
-                    })
-        print(requests)
+            patient = patients.get(request_entry["patient_id"])
+            if patient:
+                requests.append({
+                    "patient_id": str(request_entry["patient_id"]),
+                    "patient_name": patient.get("name", "Unknown"),
+                    "patient_email": patient.get("email", "Unknown"),
+                })
 
         return jsonify({"requests": requests}), 200
 
@@ -414,15 +308,11 @@ def get_requests(doctor_id):
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @medicine_bp.route('/accept-request', methods=['POST'])
+@require_auth(roles=["doctor"])
 def accept_request():
     """API for doctors to accept patient requests and grant access."""
     try:
-        #   Extract doctor authentication
-        token = request.headers.get("Authorization")
-        doctor_id = decode_token(token)  # 🔹 Extract doctor ID from token
-
-        if not doctor_id:
-            return jsonify({"error": "Unauthorized access"}), 401
+        doctor_id = g.user_id
 
         data = request.get_json()
         patient_id = data.get('patient_id')
@@ -430,26 +320,8 @@ def accept_request():
         if not patient_id:
             return jsonify({'message': 'Missing patient_id'}), 400
 
-        #  Ensure doctor exists
-        doctor = User.get_by_id(doctor_id)
-        if not doctor or doctor.get('role') != 'doctor':
-            return jsonify({'message': 'Doctor not found'}), 404
-
-        #   Find the request in `access_requests`
-        access_requests = doctor.get("access_requests", [])
-        if not isinstance(access_requests, list):
-            access_requests = []  # Default to an empty list
-
-        #   Filter out accepted request and update MongoDB
-        updated_requests = [req for req in access_requests if req.get("patient_id") != patient_id]
-
-        #   Update doctor record
-        update_result = User.update(doctor_id, {
-            "$set": {"access_requests": updated_requests},  # Remove accepted request
-            "$addToSet": {"authorized_patients": patient_id}  # Add patient to authorized list
-        })
-
-        if update_result.modified_count == 0:
+        #   Remove the pending request and add the patient to the authorized list
+        if not User.accept_access_request(doctor_id, patient_id):
             return jsonify({"message": "Failed to accept request"}), 500
 
         return jsonify({'message': 'Request accepted, access granted'}), 200
@@ -459,17 +331,13 @@ def accept_request():
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @medicine_bp.route('/save-summary', methods=['POST'])
+@require_auth()
 def save_summary():
     """
     Saves the extracted report summary in the user's profile.
     """
     try:
-        #   Authenticate User
-        token = request.headers.get("Authorization")
-        user_id = decode_token(token)
-
-        if not user_id:
-            return jsonify({"error": "Unauthorized access"}), 401
+        user_id = g.user_id
 
         #   Extract Summary Data from Request
         data = request.json
@@ -479,58 +347,97 @@ def save_summary():
         if not extracted_text or not summary:
             return jsonify({"error": "Missing extracted text or summary"}), 400
 
-        #   Create Report Entry
-        report_entry = {
-            "summary": summary,
-            "extracted_text": extracted_text,
-            "created_at": datetime.now(pytz.utc)
-        }
-
-        #   Save the report under the user's `reports` field
-        update_result = User.update(user_id, {"$push": {"reports": report_entry}})
-
-        if update_result.modified_count == 0:
-            return jsonify({"error": "Failed to save summary"}), 500
+        #   Save the report in the user's reports
+        report_entry = User.save_report(user_id, summary, extracted_text=extracted_text)
 
         return jsonify({"message": "Summary saved successfully", "report": report_entry}), 201
 
     except Exception as e:
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
     
+def _authorized_patients(doctor_id, limit=None, after=None):
+    """
+    Yield (cursor, patient data) for every one of the doctor's patient links, reading the
+    links from a Mongo cursor and loading patients, medicines and reports one chunk at a time,
+    so only STREAM_CHUNK_SIZE patients are held in memory. Patient data is None for a link
+    whose patient no longer exists; the link still counts towards `limit`.
+    """
+    links = User.iter_patient_links(doctor_id, limit, after, Config.STREAM_CHUNK_SIZE)
+    chunk = []
+    for link in links:
+        chunk.append(link)
+        if len(chunk) == Config.STREAM_CHUNK_SIZE:
+            yield from _load_patient_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from _load_patient_chunk(chunk)
+
+
+def _load_patient_chunk(links):
+    patient_ids = [str(link["patient_id"]) for link in links]
+    patients = User.get_many(patient_ids, "dashboard")
+    medicines = Medicine.get_for_users(list(patients))
+    reports = User.get_reports_for_users(list(patients))
+
+    for link, patient_id in zip(links, patient_ids):
+        patient = patients.get(patient_id)
+        if not patient:
+            yield str(link["_id"]), None
+            continue
+        yield str(link["_id"]), {
+            "patient_id": patient_id,
+            "name": patient.get("name", "Unknown"),
+            "saved_medicines": medicines[patient_id]["saved"],
+            "current_medicines": medicines[patient_id]["current"],
+            "reports": reports[patient_id]
+        }
+
+
+def _wants_ndjson():
+    return request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson"
+
+
 @medicine_bp.route('/get-authorized-patients-data/<doctor_id>', methods=['GET'])
+@require_auth(roles=["doctor"])
 def get_authorized_patients_data(doctor_id):
     """
-    Fetch reports, saved medicines, and current medicines of all authorized patients for a given doctor.
+    Fetch reports, saved medicines, and current medicines of the authorized patients for a given doctor.
+    - JSON (default): one page of ?limit= patients after ?after=, with `next_cursor` for the next page.
+    - NDJSON (?format=ndjson or Accept: application/x-ndjson): streams one patient per line
+      (every patient after ?after=, or ?limit= of them), each with the `cursor` to resume after it.
     """
     try:
-        #   Authenticate Doctor
-        token = request.headers.get("Authorization")
-        decoded_user_id = decode_token(token)
-
-        if not decoded_user_id or str(decoded_user_id) != str(doctor_id):
+        #   Doctors can only read their own patients
+        if str(g.user_id) != str(doctor_id):
             return jsonify({"error": "Unauthorized access"}), 403
 
-        #   Retrieve Doctor's Record
-        doctor = User.get_by_id(doctor_id)
-        if not doctor or doctor.get("role") != "doctor":
-            return jsonify({"error": "Doctor not found"}), 404
+        if _wants_ndjson():
+            limit = request.args.get("limit", type=int)
+            after = request.args.get("after")
+            if (limit is not None and limit < 1) or (after and not ObjectId.is_valid(after)):
+                return jsonify({"error": "Invalid pagination parameters"}), 400
 
-        #   Retrieve Details of Authorized Patients
-        authorized_patients = doctor.get("authorized_patients", [])
-        patients_data = []
+            def generate():
+                for cursor, patient in _authorized_patients(doctor_id, limit, after):
+                    if patient:
+                        yield current_app.json.dumps(dict(patient, cursor=cursor)) + "\n"
 
-        for patient_id in authorized_patients:
-            patient = User.get_by_id(patient_id)
+            return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+        limit, after = parse_page_args(request.args)
+        cursor, links_read, patients_data = None, 0, []
+        for cursor, patient in _authorized_patients(doctor_id, limit, after):
+            links_read += 1
             if patient:
-                patients_data.append({
-                    "patient_id": str(patient["_id"]),
-                    "name": patient.get("name", "Unknown"),
-                    "saved_medicines": patient.get("saved_medicines", []),
-                    "current_medicines": patient.get("current_medicines", []),
-                    "reports": patient.get("reports", [])
-                })
+                patients_data.append(patient)
 
-        return jsonify({"authorized_patients": patients_data}), 200
+        # A page can hold fewer patients than links (deleted patients), so go by the links read
+        return jsonify({
+            "authorized_patients": patients_data,
+            "next_cursor": cursor if links_read == limit else None
+        }), 200
 
+    except ValueError as e:
+        return jsonify({"error": "Invalid pagination parameters", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "An error occurred", "message": str(e)}), 500
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level packages (config, models, utils, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An in-memory stand-in for the app's Mongo database."""
+    mongomock = pytest.importorskip("mongomock")
+    from database import mongo
+    database = mongomock.MongoClient().db
+    monkeypatch.setattr(mongo, "db", database)
+    return database
@@ -0,0 +1,46 @@
+from utils.answer_index import SimilarQueryIndex, content_words, normalize_query
+
+
+def make_index(threshold=0.8):
+    return SimilarQueryIndex(max_entries=100, ttl=3600, threshold=threshold)
+
+
+def test_normalize_query_folds_case_spacing_and_trailing_punctuation():
+    assert normalize_query("  Side effects of   Paracetamol?") == normalize_query("side effects of paracetamol")
+
+
+def test_normalize_query_keeps_scripts_signs_and_decimals():
+    assert normalize_query("paracetamol की खुराक") != normalize_query("paracetamol के दुष्प्रभाव")
+    assert normalize_query("BP < 120") != normalize_query("BP > 120")
+    assert normalize_query("0.5 mg") == "0.5 mg"
+
+
+def test_question_and_negation_words_are_content():
+    assert {"when", "should"} <= content_words("When should I take paracetamol?")
+    assert "without" in content_words("Can I take ibuprofen without alcohol")
+    assert "not" in content_words("Why don't antibiotics work on a cold")
+
+
+def test_different_questions_about_the_same_subject_do_not_match():
+    index = make_index()
+    index.add("how", "How to take paracetamol")
+    for question in (
+        "When should I take paracetamol",
+        "Why should I take paracetamol",
+        "Who should take paracetamol",
+        "Should I take paracetamol",
+    ):
+        assert index.find(question) is None, question
+
+
+def test_negation_does_not_match_its_opposite():
+    index = make_index()
+    index.add("with", "Can I take ibuprofen with alcohol")
+    assert index.find("Can I take ibuprofen without alcohol") is None
+    assert index.find("Can I not take ibuprofen with alcohol") is None
+
+
+def test_rephrasing_of_the_same_question_matches():
+    index = make_index(threshold=0.9)
+    index.add("how", "How should I take Paracetamol tablets?")
+    assert index.find("how should you take paracetamol tablet") == "how"
@@ -0,0 +1,47 @@
+import pytest
+from flask import Flask
+
+from models.user_models import User
+from routes import auth_routes as routes
+from utils.password_hashing import HashingOverloaded
+
+
+@pytest.fixture
+def client(db):
+    app = Flask(__name__)
+    app.register_blueprint(routes.auth_routes, url_prefix="/auth")
+    return app.test_client()
+
+
+def test_reset_password_retry_after_overload_uses_the_same_otp(db, client, monkeypatch):
+    user_id = db.users.insert_one({"email": "pat@example.com", "password": "old", "role": "patient"}).inserted_id
+    otp = User.generate_otp("pat@example.com")
+    body = {"email": "pat@example.com", "otp": otp, "password": "new-password"}
+
+    def overloaded(password):
+        raise HashingOverloaded()
+
+    monkeypatch.setattr(routes, "hash_password", overloaded)
+    response = client.post("/auth/reset_password", json=body)
+    assert response.status_code == 503
+    assert db.users.find_one({"_id": user_id})["password"] == "old"
+
+    monkeypatch.setattr(routes, "hash_password", lambda password: f"hashed:{password}")
+    response = client.post("/auth/reset_password", json=body)
+    assert response.status_code == 200
+    assert db.users.find_one({"_id": user_id})["password"] == "hashed:new-password"
+
+    # The OTP is used up once the password has been changed
+    assert client.post("/auth/reset_password", json=body).status_code == 400
+
+
+def test_reset_password_rejects_a_wrong_otp_without_hashing(db, client, monkeypatch):
+    db.users.insert_one({"email": "pat@example.com", "password": "old", "role": "patient"})
+    User.generate_otp("pat@example.com")
+
+    def never(password):
+        raise AssertionError("hashed a password for an invalid OTP")
+
+    monkeypatch.setattr(routes, "hash_password", never)
+    body = {"email": "pat@example.com", "otp": "000000", "password": "new-password"}
+    assert client.post("/auth/reset_password", json=body).status_code == 400
@@ -0,0 +1,42 @@
+from utils.leases import ShardLeases
+
+
+def workers(count, shards=8):
+    return [ShardLeases("reminders", shards, owner=f"worker-{i}") for i in range(count)]
+
+
+def test_a_later_worker_gets_an_even_share(db):
+    first, second = workers(2)
+    assert first.refresh() == list(range(8))  # Alone, it serves every shard
+
+    assert second.refresh() == []  # Everything is still held by the first worker
+    assert len(first.refresh()) == 4  # It sees a second live worker and hands half back
+    assert len(second.refresh()) == 4
+    assert sorted(first.owned + second.owned) == list(range(8))
+
+    # Steady state: nobody takes a shard from the other
+    assert len(first.refresh()) == 4 and len(second.refresh()) == 4
+    assert not set(first.owned) & set(second.owned)
+
+
+def test_shards_of_a_leaving_worker_are_taken_over(db):
+    first, second = workers(2)
+    first.refresh(), second.refresh(), first.refresh(), second.refresh()
+
+    second.leave()
+    assert first.refresh() == list(range(8))
+
+
+def test_uneven_split_covers_every_shard(db):
+    group = workers(3)
+    for _ in range(3):
+        for worker in group:
+            worker.refresh()
+    owned = [shard for worker in group for shard in worker.owned]
+    assert sorted(owned) == list(range(8))
+    assert max(len(worker.owned) for worker in group) == 3
+
+
+def test_max_owned_caps_the_share(db):
+    worker = ShardLeases("reminders", 8, max_owned=2, owner="capped")
+    assert len(worker.refresh()) == 2
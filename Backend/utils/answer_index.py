@@ -0,0 +1,185 @@
+"""
+Query normalization and near-duplicate lookup for cached /ask-ai answers.
+
+normalize_query() only folds case, Unicode form, spacing and trailing punctuation, so
+"Side effects of Paracetamol?" and "side effects of paracetamol" share one cache entry while
+questions in any script, "BP < 120" / "BP > 120" and "0.5 mg" / "5 mg" stay apart.
+SimilarQueryIndex (opt-in) goes one step further: it remembers the content words of recently
+answered questions (accents and filler words dropped) and finds an earlier question whose word
+set is close enough (Jaccard similarity at or above a threshold) and that asks the same kind
+of question (same question words and modals, same negation), using MinHash signatures with
+LSH banding so a lookup only compares a handful of candidates instead of every cached
+question.
+"""
+import hashlib
+import random
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Words that do not change what is being asked. Question words, modals, negations and
+# prepositions do ("when should I take" vs "how to take", "with" vs "without"), so they stay.
+STOP_WORDS = frozenset("""
+a an and any are be do does give i is it its me my of please s tell the there this to you your
+""".split())
+
+# Two questions only share an answer when they have the same of these...
+QUESTION_WORDS = frozenset("""
+can could how may might must shall should what when where which who whom whose why will would
+""".split())
+# ...and the same of these
+NEGATIONS = frozenset("cannot never no none nor not without".split())
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_query(query):
+    """`query` case-folded and NFKC-normalized, with whitespace collapsed and trailing punctuation dropped."""
+    folded = " ".join(unicodedata.normalize("NFKC", str(query)).casefold().split())
+    end = len(folded)
+    while end and unicodedata.category(folded[end - 1]).startswith("P"):
+        end -= 1
+    return folded[:end].rstrip()
+
+
+def _strip_accents(text):
+    """`text` without the accents of Latin letters; marks on other scripts (e.g. Devanagari vowel signs) are kept."""
+    kept = []
+    for ch in unicodedata.normalize("NFKD", text):
+        if unicodedata.combining(ch) and kept and kept[-1].isascii():
+            continue
+        kept.append(ch)
+    return unicodedata.normalize("NFC", "".join(kept))
+
+
+def _split_words(text):
+    """
+    Words of `text`: runs of letters, digits and combining marks in any script. A point
+    between two digits stays in its number, < and > are words of their own, anything else
+    separates words.
+    """
+    chars = []
+    for i, ch in enumerate(text):
+        if ch.isalnum() or unicodedata.category(ch).startswith("M"):
+            chars.append(ch)
+        elif ch == "." and 0 < i < len(text) - 1 and text[i - 1].isdigit() and text[i + 1].isdigit():
+            chars.append(ch)
+        elif ch in "<>":
+            chars.append(f" {ch} ")
+        else:
+            chars.append(" ")
+    return "".join(chars).split()
+
+
+def content_words(query):
+    """The set of words of a query that carry its meaning (accents, stop words and plural "s" dropped)."""
+    text = normalize_query(query).replace("n't", " not").replace("n\u2019t", " not")
+    words = set()
+    for word in _split_words(_strip_accents(text)):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return frozenset(words)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def question_kind(words):
+    """What a set of content words asks, apart from its subject: its question words and negations."""
+    return words & QUESTION_WORDS, words & NEGATIONS
+
+
+class SimilarQueryIndex:
+    """
+    In-process LRU (max_entries, ttl seconds) of answered questions: cache key -> content words.
+    `bands` x `rows` MinHash values per question; two questions share a bucket when one band
+    matches, which makes pairs above roughly (1 / bands) ** (1 / rows) similarity likely
+    candidates. Candidates are then checked against the exact Jaccard threshold and must have
+    the same question_kind(), so "why take X" never gets the answer to "how to take X".
+    """
+
+    def __init__(self, max_entries, ttl, threshold, bands=16, rows=4, seed=1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(seed)  # Same permutations in every process
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(bands * rows)
+        ]
+        self._entries = OrderedDict()  # key -> (words, band keys, stored_at)
+        self._buckets = {}  # (band, band hash) -> set of keys
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _word_hash(word):
+        return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def _band_keys(self, words):
+        hashes = [self._word_hash(word) for word in words]
+        signature = [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._permutations]
+        return [(band, hash(tuple(signature[band * self.rows:(band + 1) * self.rows]))) for band in range(self.bands)]
+
+    def _remove(self, key):
+        _, band_keys, _ = self._entries.pop(key)
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def add(self, key, query):
+        words = content_words(query)
+        if not words:
+            return
+        band_keys = self._band_keys(words)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (words, band_keys, time.time())
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def find(self, query):
+        """Cache key of the most similar live question at or above the threshold, or None."""
+        words = content_words(query)
+        if not words:
+            return None
+        band_keys = self._band_keys(words)
+        now = time.time()
+        best_key, best_score = None, self.threshold
+        with self._lock:
+            candidates = set()
+            for band_key in band_keys:
+                candidates |= self._buckets.get(band_key, set())
+            kind = question_kind(words)
+            for key in candidates:
+                entry_words, _, stored_at = self._entries[key]
+                if now - stored_at > self.ttl:
+                    self._remove(key)
+                    continue
+                if question_kind(entry_words) != kind:
+                    continue
+                score = jaccard(words, entry_words)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+        return best_key
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,87 @@
+"""
+`@require_auth` replaces the per-blueprint token helpers. Verified tokens are remembered in
+a bounded LRU keyed by the token's digest until they expire, and the caller's user document
+is loaded at most once per request (through the request-cached user loader).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, jsonify, request
+
+from config import Config
+from models.user_loader import load_user
+from models.user_models import resolve_projection
+from utils import metrics
+from utils.token_utils import decode_token_payload
+
+_verified = OrderedDict()  # sha256(token) -> (user_id, expires_at)
+_verified_lock = threading.Lock()
+
+
+def bearer_token():
+    header = request.headers.get("Authorization", "")
+    return header[7:].strip() if header.startswith("Bearer ") else header.strip() or None
+
+
+def verify_cached(token):
+    """User id for a valid `token`, or None. Only the first use of a token decodes the JWT."""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.time()
+    with _verified_lock:
+        cached = _verified.get(key)
+        if cached and cached[1] > now:
+            _verified.move_to_end(key)
+            metrics.incr("auth.token_cache_hits")
+            return cached[0]
+
+    payload = decode_token_payload(token)
+    metrics.incr("auth.token_cache_misses")
+    if not payload:
+        return None
+    with _verified_lock:
+        _verified[key] = (payload["user_id"], payload.get("exp", now))
+        _verified.move_to_end(key)
+        while len(_verified) > Config.TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return payload["user_id"]
+
+
+def _with_role(projection):
+    """`projection` (view name or dict) with `role` included, so role checks need no extra query."""
+    projection = resolve_projection(projection)
+    if not projection:
+        return None
+    if any(value == 0 for key, value in projection.items() if key != "_id"):
+        return projection  # Exclusion projection, role is already there
+    return dict(projection, role=1)
+
+
+def require_auth(roles=None, projection=None):
+    """
+    Reject requests without a valid bearer token (401). The caller's id is put in
+    `g.user_id`; with `projection` (a user view name or projection dict) or `roles`, the
+    user document is loaded into `g.user` (404 if it no longer exists) and its role is
+    checked against `roles` (403).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = bearer_token()
+            user_id = verify_cached(token) if token else None
+            if not user_id:
+                return jsonify({"error": "Invalid or expired token"}), 401
+            g.user_id = user_id
+
+            if projection is not None or roles:
+                g.user = load_user(user_id, _with_role(projection or "role"))
+                if not g.user:
+                    return jsonify({"error": "User not found"}), 404
+                if roles and g.user.get("role") not in roles:
+                    return jsonify({"error": "Unauthorized request"}), 403
+
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,52 @@
+import threading
+
+from config import Config
+from models.indexes import apply_indexes
+from models.medicine_models import Medicine
+from models.user_models import User
+from utils.drug_images import warm_image_catalog
+from utils import leases
+from utils.job_worker import job_worker
+from utils.leases import run_periodic
+from utils.mail_queue import mail_sender
+from utils.reminder_scheduler import reminder_dispatcher
+
+_started = False
+
+
+def setup_collections():
+    """One-off preparation of the collections (indexes and backfills), done by a single process."""
+    if not leases.acquire("collections-setup"):
+        return
+    with leases.holding("collections-setup", release_after=True):
+        if Config.INDEX_BOOTSTRAP:
+            apply_indexes()
+        Medicine.backfill_expires_at()
+        User.backfill_name_tokens()
+
+
+def start_background_jobs():
+    """
+    Start the periodic jobs for this process. Safe to call from every worker: each job is
+    guarded by a Mongo lease, so only one process in the cluster actually runs it (the
+    reminder dispatcher is split into REMINDER_SHARDS leases instead).
+    """
+    global _started
+    if _started:
+        return
+    _started = True
+
+    jobs = [
+        ("collections-setup", setup_collections),
+        ("reminder-dispatcher", reminder_dispatcher.run),
+        ("mail-sender", mail_sender.run),
+        ("job-worker", job_worker.run),
+        ("medicine-cleanup", lambda: run_periodic("medicine-cleanup", Config.MEDICINE_EXPIRY_INTERVAL, Medicine.clean_expired_medicines)),
+    ]
+    if Config.IMAGE_WARMER_ENABLED:
+        jobs.append(
+            ("image-warmer", lambda: run_periodic("image-warmer", 3600, lambda: warm_image_catalog(Config.IMAGE_WARMER_HOURLY_BUDGET)))
+        )
+
+    for name, target in jobs:
+        threading.Thread(target=target, name=name, daemon=True).start()
@@ -0,0 +1,214 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import bson
+from pymongo import ASCENDING, ReturnDocument
+
+from config import Config
+from database import mongo
+from utils import metrics
+
+_refresh_pool = ThreadPoolExecutor(max_workers=Config.CACHE_REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+
+
+def hash_key(*parts):
+    """Build a compact cache key from arbitrary (possibly long) strings."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """Size-bounded in-process LRU."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class MongoBackend:
+    """
+    Cache entries in a shared collection so every worker benefits from a hit.
+    With `max_entries`, the entries of each cache (the key prefix before ":") are bounded
+    like the memory tier: reads stamp `used_at`, and writes beyond the bound evict the least
+    recently used ones. Values larger than `max_value_bytes` (BSON) are not stored here.
+    """
+
+    def __init__(self, collection_name=None, max_entries=None, max_value_bytes=None):
+        self.collection_name = collection_name or Config.CACHE_COLLECTION
+        self.max_entries = max_entries
+        self.max_value_bytes = max_value_bytes
+
+    @property
+    def collection(self):
+        # Expired entries are purged by the purge_at TTL index (see models/indexes.py)
+        return mongo.db[self.collection_name]
+
+    def get(self, key):
+        if self.max_entries:
+            doc = self.collection.find_one_and_update(
+                {"_id": key}, {"$set": {"used_at": datetime.now(timezone.utc)}}, return_document=ReturnDocument.AFTER
+            )
+        else:
+            doc = self.collection.find_one({"_id": key})
+        if not doc:
+            return None
+        return {"value": doc["value"], "stored_at": doc["stored_at"], "ttl": doc["ttl"]}
+
+    def set(self, key, entry):
+        if self.max_value_bytes and len(bson.encode({"value": entry["value"]})) > self.max_value_bytes:
+            metrics.incr("cache.mongo.oversized")
+            return
+        purge_at = datetime.fromtimestamp(entry["stored_at"] + entry["ttl"] + Config.CACHE_STALE_TTL, timezone.utc)
+        doc = dict(entry, purge_at=purge_at)
+        if self.max_entries:
+            doc.update(cache=key.split(":", 1)[0], used_at=datetime.now(timezone.utc))
+        self.collection.replace_one({"_id": key}, doc, upsert=True)
+        if self.max_entries:
+            self._evict(doc["cache"])
+
+    def _evict(self, cache):
+        excess = self.collection.count_documents({"cache": cache}) - self.max_entries
+        if excess <= 0:
+            return
+        oldest = self.collection.find({"cache": cache}, {"_id": 1}).sort("used_at", ASCENDING).limit(excess)
+        evicted = self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in oldest]}})
+        metrics.incr("cache.mongo.evictions", evicted.deleted_count)
+
+
+class UpstreamCache:
+    """
+    Read-through cache for one upstream API.
+
+    Entries are served fresh for `ttl` seconds, then for another CACHE_STALE_TTL seconds they
+    are still returned immediately while a background refresh fetches a new value.
+    A fetch returning None ("not found") is cached for the shorter CACHE_NEGATIVE_TTL.
+    With `serve_stale=False` an expired entry is a plain miss (no background refresh), for
+    results that never change once computed.
+    """
+
+    def __init__(self, name, ttl, backends=None, serve_stale=True):
+        self.name = name
+        self.ttl = ttl
+        self.serve_stale = serve_stale
+        self.backends = backends if backends is not None else default_backends()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _count(self, event):
+        metrics.incr(f"cache.{self.name}.{event}")
+
+    def _read(self, key):
+        """Return the first fresh entry across the tiers, else the newest stale one."""
+        stale = None
+        for depth, backend in enumerate(self.backends):
+            try:
+                entry = backend.get(key)
+            except Exception as e:
+                print(f"Cache backend error ({self.name}): {e}")
+                self._count("errors")
+                continue
+            if entry is None:
+                continue
+            if time.time() - entry["stored_at"] <= entry["ttl"]:
+                for upper in self.backends[:depth]:  # Promote into the faster tiers
+                    upper.set(key, entry)
+                return entry
+            if stale is None or entry["stored_at"] > stale["stored_at"]:
+                stale = entry
+        return stale
+
+    def _write(self, key, value):
+        entry = {
+            "value": value,
+            "stored_at": time.time(),
+            "ttl": self.ttl if value is not None else Config.CACHE_NEGATIVE_TTL,
+        }
+        for backend in self.backends:
+            try:
+                backend.set(key, entry)
+            except Exception as e:
+                print(f"Cache backend error ({self.name}): {e}")
+                self._count("errors")
+
+    def _fetch(self, key, fetch, cacheable):
+        value = fetch()
+        if cacheable is None or value is None or cacheable(value):
+            self._write(key, value)
+        return value
+
+    def _refresh(self, key, fetch, cacheable):
+        try:
+            self._fetch(key, fetch, cacheable)
+            self._count("refreshes")
+        except Exception as e:
+            print(f"Background refresh failed ({self.name}): {e}")
+            self._count("refresh_errors")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key, fetch, cacheable):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        _refresh_pool.submit(self._refresh, key, fetch, cacheable)
+
+    def get_or_fetch(self, key, fetch, cacheable=None):
+        """
+        Return the cached value for `key`, calling `fetch()` on a miss.
+        `cacheable(value)` can reject results (e.g. upstream errors) that must not be stored.
+        """
+        key = f"{self.name}:{key}"
+        entry = self._read(key)
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age <= entry["ttl"]:
+                self._count("negative_hits" if entry["value"] is None else "hits")
+                return entry["value"]
+            if self.serve_stale and age <= entry["ttl"] + Config.CACHE_STALE_TTL:
+                self._count("stale_hits")
+                self._schedule_refresh(key, fetch, cacheable)
+                return entry["value"]
+
+        self._count("misses")
+        return self._fetch(key, fetch, cacheable)
+
+    def peek(self, key):
+        """The fresh cached value for `key`, or None. Never calls the upstream."""
+        entry = self._read(f"{self.name}:{key}")
+        if entry is not None and time.time() - entry["stored_at"] <= entry["ttl"] and entry["value"] is not None:
+            self._count("hits")
+            return entry["value"]
+        self._count("misses")
+        return None
+
+    def put(self, key, value):
+        """Store a value obtained outside get_or_fetch() (e.g. assembled from a streamed response)."""
+        self._write(f"{self.name}:{key}", value)
+
+
+def default_backends(max_entries=None, shared_max_entries=None, max_value_bytes=None):
+    """Memory LRU of `max_entries`, then (CACHE_BACKEND=mongo) the shared collection, optionally bounded."""
+    backends = [MemoryBackend(max_entries or Config.CACHE_MAX_ENTRIES)]
+    if Config.CACHE_BACKEND == "mongo":
+        backends.append(MongoBackend(max_entries=shared_max_entries, max_value_bytes=max_value_bytes))
+    return backends
@@ -0,0 +1,68 @@
+from config import Config
+from database import mongo
+from models.image_models import DrugImage
+from utils.http_client import get_session, timeout_for
+from utils.label_store import normalize_key
+from utils import metrics
+
+SERPAPI_URL = "https://serpapi.com/search"
+
+
+# Function to fetch the first image from Google search
+def request_first_image(drug_name):
+    params = {
+        "q": drug_name,
+        "tbm": "isch",  # Image search
+        "api_key": Config.SERPAPI_KEY
+    }
+
+    response = get_session("serpapi").get(SERPAPI_URL, params=params, timeout=timeout_for("serpapi"))
+    data = response.json()
+    metrics.incr("serpapi.queries")
+
+    # Get the first image URL
+    if "images_results" in data and data["images_results"]:
+        return data["images_results"][0]["original"]
+    return None
+
+
+def lookup_drug_image(drug_name):
+    """Read the image catalog first and only spend a SerpAPI query on a catalog miss."""
+    entry = DrugImage.get(drug_name)
+    if entry is not None:
+        metrics.incr("drug_images.catalog_hits")
+        return entry["image_url"]
+
+    metrics.incr("drug_images.catalog_misses")
+    image_url = request_first_image(drug_name)
+    DrugImage.save(drug_name, image_url)
+    return image_url
+
+
+def most_used_medicine_names(limit):
+    """Names appearing most often across saved and current medicines."""
+    pipeline = [
+        {"$project": {"name": {"$ifNull": ["$brand_name", "$name"]}}},
+        {"$match": {"name": {"$type": "string", "$nin": ["", "N/A"]}}},
+        {"$group": {"_id": {"$toLower": {"$trim": {"input": "$name"}}}, "name": {"$first": "$name"}, "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ]
+    return [doc["name"] for doc in mongo.db.medicines.aggregate(pipeline, allowDiskUse=True)]
+
+
+def warm_image_catalog(budget):
+    """Fetch images for the most popular uncatalogued names, spending at most `budget` queries."""
+    names = most_used_medicine_names(Config.IMAGE_WARMER_CANDIDATES)
+    known = DrugImage.known_keys(names)
+    missing = [name for name in names if normalize_key(name) not in known]
+
+    fetched = 0
+    for name in missing[:budget]:
+        try:
+            DrugImage.save(name, request_first_image(name))
+            fetched += 1
+        except Exception as e:
+            print(f"Image warmer failed for {name}: {e}")
+    metrics.incr("drug_images.warmed", fetched)
+    return fetched
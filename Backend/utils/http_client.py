@@ -0,0 +1,36 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+# Shared pool for running independent upstream calls concurrently
+upstream_pool = ThreadPoolExecutor(max_workers=Config.UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(upstream):
+    """
+    Return the keep-alive session for an upstream, so TLS connections are reused across
+    requests instead of paying a fresh handshake on every call.
+    """
+    session = _sessions.get(upstream)
+    if session is None:
+        with _lock:
+            session = _sessions.get(upstream)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.UPSTREAM_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[upstream] = session
+    return session
+
+
+def timeout_for(upstream):
+    """(connect, read) timeout in seconds for calls to `upstream`."""
+    return (Config.UPSTREAM_CONNECT_TIMEOUT, Config.UPSTREAM_TIMEOUTS[upstream])
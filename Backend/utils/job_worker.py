@@ -0,0 +1,136 @@
+"""
+Background execution of submitted OCR / summarization jobs (see routes/job_routes.py).
+Requests only store the preprocessed uploads (`job_pages`) and a `jobs` record and return
+the job id; every process runs a JobWorker that claims queued jobs while it has a free
+thread, runs them on its pool and writes progress and the result back to the job document.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+
+from config import Config
+from models.job_models import Job
+from models.user_models import User
+from utils import metrics
+from utils.ocr_utils import extract_prescription, prescription_response, process_prepared_pages
+
+_wake = threading.Event()
+
+
+def notify_job_queued():
+    """Let this process's worker pick a new job up without waiting for the next poll."""
+    _wake.set()
+
+
+def run_prescription(job):
+    image_bytes, digest = Job.get_pages(job["_id"])[0]
+    result = prescription_response(extract_prescription(image_bytes, digest))
+    Job.set_progress(job, 1, 1)
+    return result
+
+
+def run_report(job):
+    pages = Job.get_pages(job["_id"])
+    extracted_text, summary = process_prepared_pages(
+        pages, on_page=lambda done, total: Job.set_progress(job, done, total)
+    )
+    result = {"pages": len(pages), "extracted_text": extracted_text, "summary": summary}
+    params = job["params"]
+    if params.get("save"):
+        result["report"] = User.save_report(
+            job["user_id"], summary, report_files=params.get("files"), extracted_text=extracted_text
+        )
+    return result
+
+
+@contextmanager
+def claim_held(job):
+    """
+    Extend the claim on `job` from a heartbeat thread while the block runs, so a single
+    model call that outlasts JOB_CLAIM_TIMEOUT does not get the job re-claimed and run twice.
+    """
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(Config.JOB_CLAIM_TIMEOUT / 3):
+            try:
+                if not Job.heartbeat(job):
+                    print(f"Lost the claim on job {job['_id']} while still running it")
+                    return
+            except Exception as e:
+                print(f"Could not extend the claim on job {job['_id']}: {e}")
+
+    thread = threading.Thread(target=heartbeat, name=f"job-{job['_id']}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+JOB_HANDLERS = {
+    "prescription": run_prescription,
+    "report": run_report,
+}
+
+
+class JobWorker:
+    """Runs up to JOB_WORKERS jobs at a time; a job is only claimed once a thread is free for it."""
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=Config.JOB_WORKERS, thread_name_prefix="job")
+        self._slots = threading.BoundedSemaphore(Config.JOB_WORKERS)
+
+    def execute(self, job):
+        started = time.perf_counter()
+        try:
+            if job["attempts"] > Config.JOB_MAX_ATTEMPTS:
+                # Claimed again and again by workers that never finished it
+                Job.fail(job, "Job could not be completed")
+                metrics.incr("jobs.abandoned")
+                return
+            with claim_held(job):
+                result = JOB_HANDLERS[job["kind"]](job)
+            Job.complete(job, result)
+            metrics.incr(f"jobs.{job['kind']}.done")
+        except Exception as e:
+            print(f"Job {job['_id']} ({job['kind']}) failed: {e}")
+            Job.fail(job, e)
+            metrics.incr(f"jobs.{job['kind']}.failed")
+        finally:
+            metrics.observe(f"jobs.{job['kind']}.seconds", time.perf_counter() - started)
+            self._slots.release()
+            _wake.set()  # A thread is free again
+
+    def claim_next(self):
+        """Claim a job if a thread is free. Returns True if one was started."""
+        if not self._slots.acquire(blocking=False):
+            return False
+        try:
+            job = Job.claim()
+        except Exception:
+            self._slots.release()
+            raise
+        if not job:
+            self._slots.release()
+            return False
+        metrics.observe("jobs.queue_seconds", time.time() - job["created_at"].replace(tzinfo=timezone.utc).timestamp())
+        self._pool.submit(self.execute, job)
+        return True
+
+    def run(self):
+        """Background loop: start jobs while there are free threads, otherwise wait for a wake-up or the next poll."""
+        while True:
+            try:
+                if self.claim_next():
+                    continue
+            except Exception as e:
+                print(f"Job worker failed: {e}")
+            _wake.wait(Config.JOB_POLL_INTERVAL)
+            _wake.clear()
+
+
+job_worker = JobWorker()
@@ -0,0 +1,170 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import zipfile
+
+# Only the parts of an OpenFDA label document that the API actually serves
+LABEL_FIELDS = (
+    "purpose",
+    "indications_and_usage",
+    "active_ingredient",
+    "do_not_use",
+    "when_using",
+    "dosage_and_administration",
+)
+# openfda.* name lists we index the label under
+KEY_FIELDS = ("brand_name", "generic_name", "substance_name")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    set_id TEXT PRIMARY KEY,
+    effective_time TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS label_keys (
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    field TEXT NOT NULL,
+    set_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_label_keys_key ON label_keys (key);
+CREATE INDEX IF NOT EXISTS idx_label_keys_set_id ON label_keys (set_id);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+
+def normalize_key(value):
+    """Lower-case and collapse whitespace so lookups are insensitive to formatting."""
+    return " ".join(str(value).lower().split())
+
+
+def compact_label(label):
+    """Reduce a full OpenFDA label to the fields served by /medicine/<name>."""
+    openfda = label.get("openfda", {})
+    doc = {field: label[field] for field in LABEL_FIELDS if label.get(field)}
+    doc["openfda"] = {field: openfda[field] for field in KEY_FIELDS if openfda.get(field)}
+    return doc
+
+
+def iter_dump_labels(path):
+    """Yield label documents from an OpenFDA drug-label export (.json or .json.zip)."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if not member.endswith(".json"):
+                    continue
+                with archive.open(member) as handle:
+                    data = json.load(io.TextIOWrapper(handle, encoding="utf-8"))
+                yield from data.get("results", [])
+    else:
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        yield from data.get("results", [])
+
+
+class LabelStore:
+    """On-disk index of OpenFDA drug labels keyed by brand, generic and substance name."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def version(self):
+        """Changes whenever an ingest commits (mtime and size of the database file); None before any ingest."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def lookup(self, name):
+        """Return the most recent label indexed under `name`, or None."""
+        row = self._connection().execute(
+            """
+            SELECT l.doc FROM label_keys k JOIN labels l ON l.set_id = k.set_id
+            WHERE k.key = ? ORDER BY l.effective_time DESC LIMIT 1
+            """,
+            (normalize_key(name),),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_names(self):
+        """Yield (name, label_count) for every brand and generic name in the index."""
+        yield from self._connection().execute(
+            "SELECT MIN(name), COUNT(*) FROM label_keys WHERE field IN ('brand_name', 'generic_name') GROUP BY key"
+        )
+
+    def upsert_label(self, conn, label):
+        """Insert or replace one label. Older versions of an already-stored label are ignored."""
+        set_id = label.get("set_id") or label.get("id")
+        if not set_id:
+            return False
+        effective_time = label.get("effective_time", "")
+
+        current = conn.execute("SELECT effective_time FROM labels WHERE set_id = ?", (set_id,)).fetchone()
+        if current and current[0] >= effective_time:
+            return False
+
+        doc = compact_label(label)
+        conn.execute(
+            "INSERT OR REPLACE INTO labels (set_id, effective_time, doc) VALUES (?, ?, ?)",
+            (set_id, effective_time, json.dumps(doc, separators=(",", ":"))),
+        )
+        conn.execute("DELETE FROM label_keys WHERE set_id = ?", (set_id,))
+        keys = {
+            (normalize_key(name), name.strip(), field)
+            for field in KEY_FIELDS
+            for name in doc["openfda"].get(field, [])
+            if name.strip()
+        }
+        conn.executemany(
+            "INSERT INTO label_keys (key, name, field, set_id) VALUES (?, ?, ?, ?)",
+            [(key, name, field, set_id) for key, name, field in keys],
+        )
+        return True
+
+    def ingest(self, paths, force=False):
+        """
+        Load one or more OpenFDA dump files into the index.
+        Files whose size and mtime match a previous run are skipped, and each label is
+        only rewritten when the dump carries a newer effective_time, so weekly updates
+        are cheap.
+        """
+        conn = self._connection()
+        stats = {"files": 0, "skipped_files": 0, "labels": 0, "updated": 0}
+
+        for path in paths:
+            st = os.stat(path)
+            name = os.path.basename(path)
+            seen = conn.execute("SELECT size, mtime FROM ingested_files WHERE name = ?", (name,)).fetchone()
+            if not force and seen and seen == (st.st_size, st.st_mtime):
+                stats["skipped_files"] += 1
+                continue
+
+            with conn:
+                for label in iter_dump_labels(path):
+                    stats["labels"] += 1
+                    if self.upsert_label(conn, label):
+                        stats["updated"] += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingested_files (name, size, mtime) VALUES (?, ?, ?)",
+                    (name, st.st_size, st.st_mtime),
+                )
+            stats["files"] += 1
+
+        return stats
@@ -0,0 +1,200 @@
+import atexit
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+from database import mongo
+
+# Identifies this process as a lease holder across the cluster
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_held = set()
+_members = set()  # ShardLeases memberships of this process
+_held_lock = threading.Lock()
+
+
+def acquire(name, ttl=None, owner=PROCESS_ID):
+    """
+    Take or renew the lease `name` for `ttl` seconds. Returns True if `owner` (this process
+    by default) holds it. A lease held by another owner can only be taken once it has
+    expired, which is how a dead holder is failed over.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        lease = mongo.db.leases.find_one_and_update(
+            {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {
+                "owner": owner,
+                "expires_at": now + timedelta(seconds=ttl or Config.LEASE_TTL),
+                "renewed_at": now
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Someone else holds an unexpired lease, so our upsert collided with their document
+        lease = None
+
+    held = bool(lease and lease["owner"] == owner)
+    if owner == PROCESS_ID:
+        with _held_lock:
+            if held:
+                _held.add(name)
+            else:
+                _held.discard(name)
+    return held
+
+
+def release(name, owner=PROCESS_ID):
+    mongo.db.leases.delete_one({"_id": name, "owner": owner})
+    if owner == PROCESS_ID:
+        with _held_lock:
+            _held.discard(name)
+
+
+@contextmanager
+def holding(name, ttl=None, release_after=False):
+    """
+    Keep the already acquired lease `name` renewed from a heartbeat thread while the block
+    runs, so a job that outlasts the lease TTL is not started a second time elsewhere.
+    With `release_after` the lease is handed back when the block ends.
+    """
+    ttl = ttl or Config.LEASE_TTL
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(ttl / 3):
+            try:
+                if not acquire(name, ttl):
+                    print(f"Lost lease {name} while still holding it")
+                    return
+            except Exception as e:
+                print(f"Could not renew lease {name}: {e}")
+
+    thread = threading.Thread(target=heartbeat, name=f"lease-{name}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        if release_after:
+            release(name)
+
+
+@atexit.register
+def _release_all():
+    """Hand leases over immediately on a clean shutdown instead of waiting for them to expire."""
+    for name in list(_held):
+        try:
+            release(name)
+        except Exception:
+            pass
+    for member_id in list(_members):  # So the remaining workers' shares grow right away
+        try:
+            mongo.db.lease_members.delete_one({"_id": member_id})
+        except Exception:
+            pass
+
+
+def shard_for(key, shards):
+    """Stable shard number for `key` (same on every process, unlike hash())."""
+    return zlib.crc32(str(key).encode("utf-8")) % shards
+
+
+class ShardLeases:
+    """
+    Leases `<prefix>:<i>` for i in range(shards), split evenly over the live workers.
+    Every refresh also renews this worker's entry in `lease_members`, and a worker holds at
+    most its share, ceil(shards / live workers) (and never more than `max_owned`), handing
+    back shards above it so a worker that starts later gets some. Workers probe from their
+    own offset, so shards spread over holders.
+    """
+
+    def __init__(self, prefix, shards, max_owned=None, owner=PROCESS_ID):
+        self.prefix = prefix
+        self.shards = shards
+        self.max_owned = max_owned or shards
+        self.owner = owner
+        self.owned = []
+        self._offset = shard_for(owner, shards)
+        self._member_id = f"{prefix}:{owner}"
+
+    def _order(self, shard):
+        return (shard - self._offset) % self.shards
+
+    def share(self):
+        """Renew this worker's membership and return how many shards it should hold."""
+        now = datetime.now(timezone.utc)
+        members = mongo.db.lease_members
+        members.update_one(
+            {"_id": self._member_id},
+            {"$set": {"group": self.prefix, "expires_at": now + timedelta(seconds=Config.LEASE_TTL)}},
+            upsert=True
+        )
+        if self.owner == PROCESS_ID:
+            with _held_lock:
+                _members.add(self._member_id)
+        live = members.count_documents({"group": self.prefix, "expires_at": {"$gt": now}})
+        return min(self.max_owned, math.ceil(self.shards / max(live, 1)))
+
+    def refresh(self):
+        """
+        Renew owned shards up to this worker's share, release the rest, pick up unowned ones
+        until the share is reached and return the owned list.
+        """
+        share = self.share()
+        keep = sorted(self.owned, key=self._order)
+        for shard in keep[share:]:
+            release(f"{self.prefix}:{shard}", self.owner)
+        owned = [shard for shard in keep[:share] if acquire(f"{self.prefix}:{shard}", owner=self.owner)]
+        for step in range(self.shards):
+            if len(owned) >= share:
+                break
+            shard = (self._offset + step) % self.shards
+            if shard not in owned and acquire(f"{self.prefix}:{shard}", owner=self.owner):
+                owned.append(shard)
+        self.owned = sorted(owned)
+        return self.owned
+
+    def leave(self):
+        """Hand back every shard and the membership, so the others take over right away."""
+        for shard in self.owned:
+            release(f"{self.prefix}:{shard}", self.owner)
+        self.owned = []
+        mongo.db.lease_members.delete_one({"_id": self._member_id})
+        with _held_lock:
+            _members.discard(self._member_id)
+
+
+def run_periodic(name, interval, job, poll=60):
+    """
+    Run `job()` every `interval` seconds on exactly one process in the cluster.
+    The time of the last run is stored with the job state, so a new leader picks up the
+    schedule where a failed one left it instead of running the job again straight away.
+    """
+    while True:
+        try:
+            if acquire(name):
+                state = mongo.db.job_state.find_one({"_id": name}) or {}
+                last_run_at = state.get("last_run_at")
+                now = datetime.now(timezone.utc)
+                if last_run_at is None or now - last_run_at.replace(tzinfo=timezone.utc) >= timedelta(seconds=interval):
+                    with holding(name):
+                        job()
+                    mongo.db.job_state.update_one(
+                        {"_id": name}, {"$set": {"last_run_at": now, "owner": PROCESS_ID}}, upsert=True
+                    )
+        except Exception as e:
+            print(f"Background job {name} failed: {e}")
+        time.sleep(poll)
@@ -0,0 +1,163 @@
+"""
+Durable outbound mail queue. Requests only insert a document into `mail_queue`; the
+background MailSender claims due messages in batches, sends them over one reused SMTP
+connection and retries failures with exponential backoff.
+Once a message is sent or has failed for good its body is dropped (it may carry a reset
+code); only the metadata is kept for MAIL_RETENTION_DAYS.
+
+To try it against a local SMTP stand-in:
+    python -m aiosmtpd -n -l localhost:1025
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=false SMTP_USER= python app.py
+"""
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from pymongo import ReturnDocument
+
+from config import Config
+from database import mongo
+from utils import metrics
+
+_wake = threading.Event()
+
+
+def enqueue_mail(to, subject, html):
+    """Queue an HTML email for delivery and return its id. Does not touch the network."""
+    now = datetime.now(timezone.utc)
+    result = mongo.db.mail_queue.insert_one({
+        "to": to,
+        "subject": subject,
+        "html": html,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now
+    })
+    metrics.incr("mail.queued")
+    _wake.set()  # Let this process's sender pick it up without waiting for the next poll
+    return result.inserted_id
+
+
+def build_message(mail):
+    msg = MIMEMultipart()
+    msg["From"] = Config.MAIL_SENDER
+    msg["To"] = mail["to"]
+    msg["Subject"] = mail["subject"]
+    msg.attach(MIMEText(mail["html"], "html"))
+    return msg
+
+
+class MailSender:
+    """Drains mail_queue over a pooled SMTP connection that is reused until it has been idle."""
+
+    def __init__(self):
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except (smtplib.SMTPException, OSError):
+                self.close()
+
+        smtp = smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT, timeout=Config.SMTP_TIMEOUT)
+        if Config.SMTP_STARTTLS:
+            smtp.starttls()
+        if Config.SMTP_USER:
+            smtp.login(Config.SMTP_USER, Config.SMTP_PASSWORD)
+        metrics.incr("mail.smtp_connects")
+        self._smtp = smtp
+        return smtp
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def claim_batch(self, now=None):
+        """
+        Claim up to MAIL_BATCH_SIZE due messages. A claim pushes next_attempt_at forward by
+        MAIL_CLAIM_TIMEOUT, so messages held by a sender that died are picked up again later.
+        """
+        now = now or datetime.now(timezone.utc)
+        batch = []
+        while len(batch) < Config.MAIL_BATCH_SIZE:
+            mail = mongo.db.mail_queue.find_one_and_update(
+                {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": now}},
+                {"$set": {"status": "sending", "next_attempt_at": now + timedelta(seconds=Config.MAIL_CLAIM_TIMEOUT)}},
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not mail:
+                break
+            batch.append(mail)
+        return batch
+
+    def _mark_sent(self, mail):
+        now = datetime.now(timezone.utc)
+        mongo.db.mail_queue.update_one({"_id": mail["_id"]}, {
+            "$set": {"status": "sent", "sent_at": now, "purge_at": now + timedelta(days=Config.MAIL_RETENTION_DAYS)},
+            "$unset": {"html": ""},  # The body can hold an OTP; only the metadata is kept
+            "$inc": {"attempts": 1}
+        })
+        metrics.incr("mail.sent")
+        metrics.observe("mail.queue_latency_seconds", (now - mail["created_at"].replace(tzinfo=timezone.utc)).total_seconds())
+
+    def _mark_failed(self, mail, error):
+        now = datetime.now(timezone.utc)
+        attempts = mail["attempts"] + 1
+        update = {"attempts": attempts, "last_error": str(error)}
+        if attempts >= Config.MAIL_MAX_ATTEMPTS:
+            update.update(status="failed", purge_at=now + timedelta(days=Config.MAIL_RETENTION_DAYS))
+            mongo.db.mail_queue.update_one({"_id": mail["_id"]}, {"$set": update, "$unset": {"html": ""}})
+            metrics.incr("mail.failed")
+        else:
+            delay = Config.MAIL_RETRY_BASE * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+            update.update(status="pending", next_attempt_at=now + timedelta(seconds=delay))
+            mongo.db.mail_queue.update_one({"_id": mail["_id"]}, {"$set": update})
+            metrics.incr("mail.retried")
+
+    def send_batch(self, batch):
+        """Send every claimed message over one connection. Returns the number sent."""
+        sent = 0
+        for mail in batch:
+            try:
+                self._connection().sendmail(Config.MAIL_SENDER, [mail["to"]], build_message(mail).as_string())
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"Error sending email to {mail['to']}: {e}")
+                if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                    self._smtp = None  # Reconnect for the next message
+                self._mark_failed(mail, e)
+                continue
+            self._mark_sent(mail)
+            sent += 1
+        self._last_used = time.monotonic()
+        return sent
+
+    def run(self):
+        """Background loop: send due mail, otherwise wait for new mail or the next poll."""
+        while True:
+            try:
+                batch = self.claim_batch()
+                if batch:
+                    self.send_batch(batch)
+                    continue
+                if self._smtp is not None and time.monotonic() - self._last_used > Config.SMTP_IDLE_TIMEOUT:
+                    self.close()
+            except Exception as e:
+                print(f"Mail sender failed: {e}")
+            _wake.wait(Config.MAIL_POLL_INTERVAL)
+            _wake.clear()
+
+
+mail_sender = MailSender()
@@ -0,0 +1,34 @@
+import threading
+from collections import defaultdict
+
+# Process-local counters and timings, exposed through GET /api/v1/metrics
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_observations = {}
+
+
+def incr(name, value=1):
+    """Increase the counter `name` by `value`."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, value):
+    """Record one sample (a latency, a size...) for `name`, keeping count, sum and max."""
+    with _lock:
+        stats = _observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["sum"] += value
+        stats["max"] = max(stats["max"], value)
+
+
+def snapshot():
+    """Return a copy of all counters and observations."""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "observations": {
+                name: dict(stats, avg=stats["sum"] / stats["count"] if stats["count"] else 0.0)
+                for name, stats in _observations.items()
+            },
+        }
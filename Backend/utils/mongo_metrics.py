@@ -0,0 +1,62 @@
+import random
+
+import bson
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+from config import Config
+from utils import metrics
+
+# Commands whose replies carry documents back from the server
+READ_COMMANDS = {"find", "getMore", "aggregate", "findAndModify", "count", "distinct"}
+
+
+class ReadBytesListener(monitoring.CommandListener):
+    """
+    Adds the BSON size of every read reply to `g.mongo_bytes_read` for the current request.
+    pymongo calls listeners on the thread that ran the command, so the request context is
+    available for commands issued by a route.
+    Measuring re-encodes the reply, so only a MONGO_BYTES_SAMPLE_RATE share of requests
+    (and of commands issued outside a request) is measured.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name not in READ_COMMANDS:
+            return
+        in_request = has_request_context()
+        if not (g.get("mongo_bytes_sampled") if in_request else random.random() < Config.MONGO_BYTES_SAMPLE_RATE):
+            return
+        size = len(bson.encode(event.reply))
+        metrics.observe(f"mongo.reply_bytes.{event.command_name}", size)
+        if in_request:
+            g.mongo_bytes_read = g.get("mongo_bytes_read", 0) + size
+
+    def failed(self, event):
+        pass
+
+
+def mongo_listeners():
+    """Listeners to pass to the Mongo client (empty when MONGO_BYTES_METRICS is off)."""
+    return [ReadBytesListener()] if Config.MONGO_BYTES_METRICS else []
+
+
+def register_request_metrics(app):
+    """Report the bytes read from Mongo per sampled request, as a header and in /metrics."""
+    if not Config.MONGO_BYTES_METRICS:
+        return
+
+    @app.before_request
+    def sample_mongo_bytes():
+        g.mongo_bytes_sampled = random.random() < Config.MONGO_BYTES_SAMPLE_RATE
+
+    @app.after_request
+    def report_mongo_bytes(response):
+        if not g.get("mongo_bytes_sampled"):
+            return response
+        bytes_read = g.get("mongo_bytes_read", 0)
+        response.headers["X-Mongo-Bytes-Read"] = str(bytes_read)
+        metrics.observe(f"mongo.bytes_per_request.{request.endpoint or 'unknown'}", bytes_read)
+        return response
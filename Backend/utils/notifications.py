@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from firebase_admin import messaging
+
+from config import Config
+from models.reminder_models import canonical_reminder_time
+from utils import metrics
+
+FCM_MAX_BATCH = 500  # Hard limit of messaging.send_each per call
+
+_send_pool = ThreadPoolExecutor(max_workers=Config.FCM_SEND_WORKERS, thread_name_prefix="fcm-send")
+
+
+def build_reminder_messages(reminders, users):
+    """
+    Merge due reminders into one notification per (user, time slot), the slot being the
+    canonical "HH:MM" time, each medicine named once (case-insensitively).
+    Returns a list of (message, scheduled_for) pairs; users without an FCM token are skipped.
+    """
+    slots = {}
+    for reminder in reminders:
+        user = users.get(reminder["user_id"])
+        fcm_token = user.get("fcm_token") if user else None
+        if not fcm_token:
+            metrics.incr("reminders.no_token")
+            continue
+        slot_time = canonical_reminder_time(reminder["time"]) or reminder["time"]
+        slot = slots.setdefault((reminder["user_id"], slot_time), {
+            "token": fcm_token,
+            "names": {},
+            "scheduled_for": reminder["scheduled_for"],
+        })
+        name = reminder["medicine_name"].strip()
+        slot["names"].setdefault(name.casefold(), name)
+
+    messages = []
+    for (_, slot_time), slot in slots.items():
+        message = messaging.Message(
+            notification=messaging.Notification(
+                title="Medicine Reminder 💊",
+                body=f"Take {', '.join(slot['names'].values())} at {slot_time}."
+            ),
+            token=slot["token"]
+        )
+        messages.append((message, slot["scheduled_for"]))
+    return messages
+
+
+def _send_batch(batch):
+    started = time.monotonic()
+    response = messaging.send_each([message for message, _ in batch])
+    sent_at = datetime.now(timezone.utc)
+
+    metrics.observe("fcm.batch_size", len(batch))
+    metrics.observe("fcm.send_latency_seconds", time.monotonic() - started)
+    for _, scheduled_for in batch:
+        metrics.observe("reminders.lag_seconds", (sent_at - scheduled_for).total_seconds())
+    metrics.incr("fcm.sent", response.success_count)
+    metrics.incr("fcm.failed", response.failure_count)
+    return response.success_count
+
+
+def send_in_batches(messages):
+    """Send (message, scheduled_for) pairs in FCM batches from the bounded sender pool."""
+    futures = [
+        _send_pool.submit(_send_batch, messages[start:start + FCM_MAX_BATCH])
+        for start in range(0, len(messages), FCM_MAX_BATCH)
+    ]
+    wait(futures)
+
+    sent = 0
+    for future in futures:
+        try:
+            sent += future.result()
+        except Exception as e:
+            print(f"Error sending notification batch: {e}")
+            metrics.incr("fcm.batch_errors")
+    return sent
+
+
+def deliver_reminders(reminders, users):
+    """Group due reminders per user and time slot and push them through FCM."""
+    return send_in_batches(build_reminder_messages(reminders, users))
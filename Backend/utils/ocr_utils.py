@@ -0,0 +1,245 @@
+import hashlib
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+from PIL import Image, ImageOps
+
+from config import Config
+from utils import metrics
+from utils.cache import UpstreamCache, default_backends
+
+# Results are keyed by the image content, so a re-scanned prescription costs no model call.
+# They never go stale, so an expired entry is simply fetched again on the next scan.
+# Every distinct upload adds an entry, so the shared tier is bounded too (count and size).
+ocr_cache = UpstreamCache(
+    "ocr", Config.CACHE_TTLS["ocr"],
+    default_backends(Config.OCR_CACHE_MAX_ENTRIES, Config.OCR_CACHE_SHARED_MAX_ENTRIES, Config.OCR_CACHE_MAX_VALUE_BYTES),
+    serve_stale=False
+)
+
+# Shared by all requests, so a burst of multi-page uploads cannot open unbounded model calls
+ocr_pool = ThreadPoolExecutor(max_workers=Config.OCR_WORKERS, thread_name_prefix="ocr")
+
+PRESCRIPTION_PROMPT = """Read this prescription or medicine package image.
+Return JSON only, in this shape:
+{"recognized_text": "<all text you can read>",
+ "medicines": [{"name": "<medicine name>", "strength": "<e.g. 500 mg, or null>", "frequency": "<e.g. twice a day, or null>"}]}
+List every medicine once. Use null for anything that is not in the image."""
+
+
+EXIF_ORIENTATION = 0x0112
+
+# JPEG segments dropped from passed-through uploads: EXIF/XMP (incl. GPS), IPTC, comments
+METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+
+
+class OcrOutputError(Exception):
+    """The model answered, but not with the JSON shape PRESCRIPTION_PROMPT asks for."""
+
+
+def _is_compliant_jpeg(image, size):
+    """A JPEG that can be uploaded as is: small enough, upright and no document filters to apply."""
+    return (
+        image.format == "JPEG"
+        and size <= Config.OCR_PASSTHROUGH_MAX_BYTES
+        and max(image.size) <= Config.OCR_MAX_DIMENSION
+        and image.mode in ("RGB", "L")
+        and image.getexif().get(EXIF_ORIENTATION, 1) == 1
+        and not Config.OCR_GRAYSCALE
+        and not Config.OCR_AUTOCONTRAST
+    )
+
+
+def strip_jpeg_metadata(data):
+    """`data` without its metadata segments (METADATA_MARKERS); the image data is copied untouched."""
+    if data[:2] != b"\xff\xd8":
+        return data
+    kept = [data[:2]]
+    i = 2
+    while i + 4 <= len(data) and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        if marker == 0xDA:  # Start of scan: the rest is image data
+            break
+        end = i + 2 + int.from_bytes(data[i + 2:i + 4], "big")
+        if marker not in METADATA_MARKERS:
+            kept.append(data[i:end])
+        i = end
+    kept.append(data[i:])
+    return b"".join(kept)
+
+
+def _draft_size(size):
+    """
+    Box for Image.draft(): the image fitted (aspect kept) to OCR_DRAFT_MIN_DIMENSION.
+    draft() only picks a power-of-two reduction that stays at or above the box in both
+    dimensions, so asking for the final OCR_MAX_DIMENSION would rule out halving a
+    4000x3000 photo (2000 < 2048); decoding is allowed down to the floor instead and
+    thumbnail() then caps the result at OCR_MAX_DIMENSION.
+    """
+    width, height = size
+    scale = min(1.0, Config.OCR_DRAFT_MIN_DIMENSION / max(width, height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def preprocess_image(stream):
+    """
+    Prepare an uploaded photo for the model and return (jpeg_bytes, digest).
+    - Compliant JPEGs (up to OCR_PASSTHROUGH_MAX_BYTES) are passed through without decoding
+      the pixels, minus their EXIF/XMP/comment metadata (which can include GPS position).
+    - Otherwise JPEGs are decoded in draft mode (the decoder scales down by a power of two
+      on the fly, see _draft_size), then EXIF-rotated, downscaled to OCR_MAX_DIMENSION,
+      optionally made grayscale / auto-contrasted, and re-encoded at OCR_JPEG_QUALITY
+      (re-encoding drops the metadata too).
+    The digest is a SHA-256 of the bytes sent to the model, so a re-scan of the same upload
+    maps to the same cache entry.
+    """
+    started = time.perf_counter()
+    raw = stream.read()
+    image = Image.open(io.BytesIO(raw))
+
+    if _is_compliant_jpeg(image, len(raw)):
+        image_bytes = strip_jpeg_metadata(raw)
+        metrics.incr("ocr.preprocess_passthrough")
+    else:
+        if image.format == "JPEG":
+            image.draft("RGB", _draft_size(image.size))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image.thumbnail((Config.OCR_MAX_DIMENSION, Config.OCR_MAX_DIMENSION))
+        if Config.OCR_GRAYSCALE:
+            image = image.convert("L")
+        if Config.OCR_AUTOCONTRAST:
+            image = ImageOps.autocontrast(image, cutoff=1)
+        with io.BytesIO() as output:
+            image.save(output, format="JPEG", quality=Config.OCR_JPEG_QUALITY)
+            image_bytes = output.getvalue()
+
+    metrics.observe("ocr.preprocess_seconds", time.perf_counter() - started)
+    metrics.observe("ocr.preprocess_bytes_saved", len(raw) - len(image_bytes))
+    return image_bytes, hashlib.sha256(image_bytes).hexdigest()
+
+
+def _parse_prescription(text):
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise OcrOutputError(f"Prescription reader returned invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise OcrOutputError("Prescription reader returned an unexpected result")
+    items = data.get("medicines") or []
+    if not isinstance(items, list):
+        raise OcrOutputError("Prescription reader returned an unexpected medicine list")
+    medicines = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"name": item}
+        name = (item.get("name") or "").strip() if isinstance(item, dict) else ""
+        if name:
+            medicines.append({"name": name, "strength": item.get("strength"), "frequency": item.get("frequency")})
+    return {"recognized_text": data.get("recognized_text") or "", "medicines": medicines}
+
+
+def request_prescription(image_bytes):
+    """One Gemini call returning the recognized text and the structured medicine list."""
+    model = genai.GenerativeModel(Config.GEMINI_MODEL)
+    response = model.generate_content(
+        [{"parts": [
+            {"text": PRESCRIPTION_PROMPT},
+            {"inline_data": {"mime_type": "image/jpeg", "data": image_bytes}}
+        ]}],
+        generation_config={"response_mime_type": "application/json"}
+    )
+    metrics.incr("ocr.model_calls")
+    try:
+        text = response.text
+    except ValueError as e:  # No text part, e.g. the answer was blocked
+        raise OcrOutputError(f"Prescription reader returned no text: {e}")
+    return _parse_prescription(text)
+
+
+def extract_prescription(image_bytes, digest):
+    """Structured OCR result for an image, from the cache when this image was seen before."""
+    return ocr_cache.get_or_fetch(digest, lambda: request_prescription(image_bytes))
+
+
+def prescription_response(result):
+    """Response body for an extract_prescription() result, as /extract_medicines returns it."""
+    return {
+        "recognized_text": result["recognized_text"] or "No text recognized",
+        # Names in the list-of-lists format the app expects, details in `details`
+        "medicines": [[medicine["name"]] for medicine in result["medicines"]],
+        "details": result["medicines"]
+    }
+
+
+def request_report_text(image_bytes):
+    model = genai.GenerativeModel(Config.GEMINI_MODEL)
+    response = model.generate_content([
+        {"parts": [
+            {"text": "Extract all the text from this medical report image:"},
+            {"inline_data": {"mime_type": "image/jpeg", "data": image_bytes}}
+        ]}
+    ])
+    metrics.incr("ocr.model_calls")
+    return response.text.strip() if response else ""
+
+
+def extract_report_text(image_bytes, digest):
+    """Full text of one report page, from the cache when this page was seen before."""
+    return ocr_cache.get_or_fetch(f"text:{digest}", lambda: request_report_text(image_bytes), cacheable=bool)
+
+
+def summarize_report(text):
+    model = genai.GenerativeModel(Config.GEMINI_MODEL)
+    response = model.generate_content([
+        {"parts": [{"text": f"Summarize the following medical report text:\n\n{text}"}]}
+    ])
+    metrics.incr("ocr.model_calls")
+    return response.text.strip() if response else "No summary generated."
+
+
+def _read_page(stream):
+    return extract_report_text(*preprocess_image(stream))
+
+
+def _read_prepared_page(page):
+    return extract_report_text(*page)
+
+
+def _ocr_report(read_page, pages, on_page):
+    started = time.perf_counter()
+    futures = [ocr_pool.submit(read_page, page) for page in pages]
+    texts = []
+    for future in futures:  # Collected in page order
+        texts.append(future.result())
+        if on_page:
+            on_page(len(texts), len(futures))
+    if len(texts) == 1:
+        extracted_text = texts[0]
+    else:
+        extracted_text = "\n\n".join(f"--- Page {number} ---\n{text}" for number, text in enumerate(texts, 1))
+    extracted_text = extracted_text or "No text recognized"
+
+    summary = summarize_report(extracted_text)
+    metrics.observe("ocr.report_pages", len(texts))
+    metrics.observe("ocr.report_seconds", time.perf_counter() - started)
+    return extracted_text, summary
+
+
+def process_report_pages(streams, on_page=None):
+    """
+    Preprocess and OCR every page concurrently on the bounded OCR pool, then summarize the
+    text merged in page order with a single call. Returns (extracted_text, summary).
+    `on_page(done, total)` is called as pages finish.
+    """
+    return _ocr_report(_read_page, streams, on_page)
+
+
+def process_prepared_pages(pages, on_page=None):
+    """process_report_pages() for pages already run through preprocess_image(): (jpeg_bytes, digest) pairs."""
+    return _ocr_report(_read_prepared_page, pages, on_page)
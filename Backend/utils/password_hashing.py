@@ -0,0 +1,96 @@
+"""
+Password hashing on a dedicated process pool, so expensive hashes never run on request
+threads (or hold their GIL). At most PASSWORD_HASH_MAX_PENDING hashes are queued or running;
+beyond that HashingOverloaded is raised right away and the routes answer 503. A hash that
+does not finish within PASSWORD_HASH_TIMEOUT is reported the same way.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+from utils import metrics
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full; the caller should shed the request."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_MAX_PENDING)
+_pending = 0
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # fork: spawn/forkserver would re-import app.py (and start its jobs) in every worker
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("fork")
+            )
+        return _pool
+
+
+def start_pool():
+    """Fork the hashing workers now, before the app starts its own threads."""
+    pool = _get_pool()
+    pool.submit(int).result()
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    return func(*args), time.perf_counter() - started
+
+
+def _release_slot(_future=None):
+    global _pending
+    with _pool_lock:
+        _pending -= 1
+    _slots.release()
+
+
+def _run(func, *args):
+    global _pending
+    if not _slots.acquire(blocking=False):
+        metrics.incr("password_hash.rejected")
+        raise HashingOverloaded()
+
+    with _pool_lock:
+        _pending += 1
+        metrics.observe("password_hash.queue_depth", _pending)
+    try:
+        future = _get_pool().submit(_timed, func, *args)
+    except Exception:
+        _release_slot()
+        raise
+    # The slot is freed when the worker is done, not when we stop waiting: a timed-out hash
+    # still occupies a worker, and must keep counting against PASSWORD_HASH_MAX_PENDING
+    future.add_done_callback(_release_slot)
+    try:
+        result, seconds = future.result(timeout=Config.PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        metrics.incr("password_hash.timeouts")
+        raise HashingOverloaded()
+
+    metrics.incr(f"password_hash.{func.__name__}")
+    metrics.observe("password_hash.seconds", seconds)
+    return result
+
+
+def hash_password(password):
+    """Hash `password` with the configured PASSWORD_HASH_METHOD."""
+    return _run(generate_password_hash, password, Config.PASSWORD_HASH_METHOD)
+
+
+def check_password(stored_password, password):
+    return _run(check_password_hash, stored_password, password)
+
+
+def needs_rehash(stored_password):
+    """True if `stored_password` was hashed with other parameters than PASSWORD_HASH_METHOD."""
+    return stored_password.split("$", 1)[0] != Config.PASSWORD_HASH_METHOD
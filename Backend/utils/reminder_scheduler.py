@@ -0,0 +1,102 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from config import Config
+from models.reminder_models import Reminder
+from models.user_models import User
+from utils.notifications import deliver_reminders
+from utils import leases
+
+
+class ReminderDispatcher:
+    """
+    Fires medicine reminders from the `reminders` collection.
+
+    The collection, ordered by its `next_fire_at` index, acts as the timer heap: the
+    dispatcher sleeps until the earliest fire time (bounded by REMINDER_MAX_SLEEP so
+    reminders added by other processes are picked up) and is woken early by `notify()`
+    when this process schedules something sooner.
+    """
+
+    def __init__(self, deliver):
+        self._deliver = deliver  # deliver(reminders, users_by_id) -> number of notifications sent
+        self._shards = leases.ShardLeases("reminders", Config.REMINDER_SHARDS, Config.REMINDER_MAX_SHARDS_PER_PROCESS)
+        self._wake = threading.Event()
+        self._next_wake = None
+        self._lock = threading.Lock()
+
+    def notify(self, fire_at):
+        """Wake the dispatcher if `fire_at` is earlier than what it is currently sleeping towards."""
+        if fire_at is None:
+            return
+        with self._lock:
+            if self._next_wake is None or fire_at < self._next_wake:
+                self._wake.set()
+
+    def setup(self):
+        """One-off preparation of the reminders collection, done by a single process."""
+        if not leases.acquire("reminders-setup"):
+            return
+        with leases.holding("reminders-setup", release_after=True):
+            if Reminder.collection().estimated_document_count() == 0:
+                print(f"Backfilled {Reminder.backfill_from_users()} medicine reminder(s)")
+            Reminder.assign_shards()
+            canonicalized = Reminder.canonicalize_times()
+            if canonicalized:
+                print(f"Normalized the time of {canonicalized} reminder(s)")
+
+    def dispatch_due(self, now, shards):
+        """
+        Claim every reminder in `shards` that is due at `now` and hand them to `deliver` in one
+        go, so reminders for the same user and slot can be merged into a single notification.
+        Returns the number of notifications sent.
+        """
+        Reminder.remove_expired(now, shards)
+        due, users = [], {}
+        while True:
+            reminders = Reminder.claim_due(now, Config.REMINDER_BATCH_SIZE, shards)
+            if not reminders:
+                break
+            # Reminders missed by more than REMINDER_MAX_LATENESS wait for their next occurrence
+            reminders = [
+                reminder for reminder in reminders
+                if now - reminder["scheduled_for"] <= timedelta(seconds=Config.REMINDER_MAX_LATENESS)
+            ]
+            users.update(User.get_many([reminder["user_id"] for reminder in reminders], {"fcm_token": 1}))
+            due.extend(reminders)
+
+        return self._deliver(due, users) if due else 0
+
+    def run(self):
+        """
+        Dispatch loop. Each pass renews this process's shard leases, so with several workers
+        or hosts every shard is served by exactly one of them, and a dead holder's shards are
+        taken over once its leases expire (LEASE_TTL).
+        """
+        setup_done = False
+        while True:
+            with self._lock:
+                self._next_wake = None  # Any notify() while dispatching triggers another pass
+                self._wake.clear()
+            next_due = None
+            try:
+                if not setup_done:
+                    self.setup()
+                    setup_done = True
+                shards = self._shards.refresh()
+                if shards:
+                    self.dispatch_due(datetime.now(timezone.utc), shards)
+                    next_due = Reminder.next_due_at(shards)
+            except Exception as e:
+                print(f"Reminder dispatcher error: {e}")
+
+            now = datetime.now(timezone.utc)
+            wake_at = now + timedelta(seconds=Config.REMINDER_MAX_SLEEP)
+            if next_due is not None:
+                wake_at = max(now, min(wake_at, next_due))
+            with self._lock:
+                self._next_wake = wake_at
+            self._wake.wait((wake_at - now).total_seconds())
+
+
+reminder_dispatcher = ReminderDispatcher(deliver_reminders)
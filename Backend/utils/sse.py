@@ -0,0 +1,12 @@
+from flask import current_app
+
+# Sent on idle streams so proxies do not close them (lines starting with ":" are comments)
+KEEPALIVE = ": keepalive\n\n"
+
+# Stop nginx and similar proxies from buffering the stream
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def sse(event, data):
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
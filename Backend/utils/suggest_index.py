@@ -0,0 +1,60 @@
+import bisect
+import heapq
+import threading
+
+from utils.label_store import normalize_key
+
+
+class SuggestIndex:
+    """
+    Memory-resident prefix index over medicine names.
+    Names are kept in a sorted array so a prefix query is two binary searches plus a
+    top-k selection by popularity over the matching range.
+    When `version()` returns something new (e.g. after ingest_labels.py has run) the index
+    is rebuilt; queries keep using the previous arrays while that happens.
+    """
+
+    def __init__(self, loader, version=None):
+        self._loader = loader  # callable returning an iterable of (name, popularity)
+        self._version = version or (lambda: None)
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self._index = None  # (keys, names, scores), swapped as a whole
+
+    def _build(self):
+        entries = {}
+        for name, popularity in self._loader():
+            key = normalize_key(name)
+            if key and popularity > entries.get(key, (None, -1))[1]:
+                entries[key] = (name, popularity)
+        keys = sorted(entries)
+        return keys, [entries[key][0] for key in keys], [entries[key][1] for key in keys]
+
+    def _ensure_loaded(self):
+        version = self._version()
+        if self._index is not None and version == self._loaded_version:
+            return self._index
+        # Only one thread rebuilds; the others keep serving the current index if there is one
+        if not self._lock.acquire(blocking=self._index is None):
+            return self._index
+        try:
+            if self._index is None or version != self._loaded_version:
+                self._index = self._build()
+                self._loaded_version = version
+            return self._index
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return len(self._ensure_loaded()[0])
+
+    def complete(self, prefix, limit=10):
+        """Return up to `limit` names starting with `prefix`, most popular first."""
+        keys, names, scores = self._ensure_loaded()
+        prefix = normalize_key(prefix)
+        if not prefix:
+            return []
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + "\uffff", lo)
+        best = heapq.nlargest(limit, range(lo, hi), key=lambda i: (scores[i], -i))
+        return [names[i] for i in best]
@@ -1,5 +1,7 @@
 import jwt
 import datetime
+import hashlib
+import hmac
 from config import Config
 
 def generate_token(user_id):
@@ -9,13 +11,22 @@ def generate_token(user_id):
     }
     return jwt.encode(payload, Config.SECRET_KEY, algorithm='HS256')
 
-def verify_token(token):
+def decode_token_payload(token):
+    """Verified JWT payload (user_id, exp), or None if the token is invalid or expired"""
     try:
-        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
-        return payload['user_id']
+        return jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+
+def verify_token(token):
+    payload = decode_token_payload(token)
+    return payload['user_id'] if payload else None
     
-    #JWT Token for an Authenticated Request
\ No newline at end of file
+    #JWT Token for an Authenticated Request
+
+def hash_otp(email, otp):
+    """Keyed hash of an OTP, so the otps collection never holds usable codes"""
+    message = f"{email}:{otp}".encode("utf-8")
+    return hmac.new(Config.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()